@@ -0,0 +1,83 @@
+"""Runs inside a copy of an app's directory, started by ``suite.py``.
+
+    python driver.py wsgi <target> <plan.json>   # drive the app through its test client
+    python driver.py serve <target> <port>       # serve it with Werkzeug's threaded server
+
+``target`` has Gunicorn's ``module:expression`` form, e.g. ``app:create_app()``.
+"""
+import importlib
+import json
+import os
+import sys
+import time
+
+from endpoints import LOGIN, RequestFactory
+
+
+def load_target(target):
+    sys.path.insert(0, os.getcwd())
+    module_name, expression = target.split(':', 1)
+    module = importlib.import_module(module_name)
+    return eval(expression, vars(module))
+
+
+def drive_wsgi(app, plan):
+    """Send ``plan['requests']`` requests to each endpoint, one at a time."""
+    client = app.test_client()
+    results = {}
+    for name, method, path, options in plan['endpoints']:
+        headers = {}
+        if options.get('auth') == 'session':
+            client.post('/login', data=LOGIN)
+        elif options.get('auth') in ('jwt', 'refresh'):
+            # Fresh token per endpoint so long runs never outlive its expiry
+            tokens = client.post('/api/login', json=LOGIN).get_json()
+            token = tokens['refresh_token' if options['auth'] == 'refresh' else 'access_token']
+            headers['Authorization'] = f'Bearer {token}'
+
+        factory = RequestFactory(plan['entry_ids'], plan['user_id'], plan['seed'])
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(plan['requests']):
+            url, body = factory.build(path, options)
+            kwargs = {'json': body} if 'json' in options else {'data': body}
+            begin = time.perf_counter()
+            response = client.open(url, method=method, headers=headers, **kwargs)
+            response.get_data()
+            latencies.append(time.perf_counter() - begin)
+            response.close()
+            if response.status_code >= 400:
+                errors += 1
+            elif options.get('auth') == 'refresh':
+                headers['Authorization'] = f"Bearer {response.get_json()['refresh_token']}"
+            if time.perf_counter() - started > plan['max_seconds']:
+                break
+        results[name] = {'latencies': latencies, 'errors': errors,
+                         'elapsed': time.perf_counter() - started}
+    return results
+
+
+def serve(app, port):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    make_server('127.0.0.1', port, app, threaded=True, request_handler=QuietHandler).serve_forever()
+
+
+def main():
+    mode, target, arg = sys.argv[1:4]
+    app = load_target(target)
+    if mode == 'serve':
+        serve(app, int(arg))
+    else:
+        with open(arg) as f:
+            plan = json.load(f)
+        plan['entry_ids'] = range(*plan['entry_ids'])
+        print(json.dumps(drive_wsgi(app, plan)))
+
+
+if __name__ == '__main__':
+    main()
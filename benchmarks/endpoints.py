@@ -0,0 +1,140 @@
+"""What each app serves and which requests the suite sends to it.
+
+An endpoint is ``(name, method, path, options)``. ``path`` and the strings of
+a ``json``/``form`` body may contain ``{id}``, ``{category}``, ``{word}`` and
+``{username}`` placeholders, filled from the seeded data with a seeded RNG so
+every run sends the same requests; ``{username}`` is new on every request.
+``{unused_id}`` is an id no earlier request of the endpoint got, taken from
+its ``share`` ``(k, n)`` of the seeded entries (every n-th id from the k-th),
+so deletes never hit an entry that's already gone. They run last, so the
+other endpoints never do either.
+
+``auth`` is ``'session'`` (logged in through the web form), ``'jwt'`` (bearer
+token from ``/api/login``) or ``'refresh'`` (its refresh token, replaced by
+the one in each response since rotation makes every refresh token single-use).
+
+Not listed: ``/logout`` and ``/api/token/revoke``, which end the session or
+token the next request would need, and the change stream, which doesn't end.
+"""
+import itertools
+import random
+from urllib.parse import quote
+
+from seed import BENCH_PASSWORD, BENCH_USER, CATEGORIES, WORDS
+
+LOGIN = {'username': BENCH_USER, 'password': BENCH_PASSWORD}
+
+ENTRY_BODY = {'title': 'benchmark entry', 'category': 'Benchmarks',
+              'content': 'written by the benchmark suite'}
+
+WEB_ENDPOINTS = [
+    ('web index', 'GET', '/', {}),
+    ('web login form', 'GET', '/login', {}),
+    ('web login', 'POST', '/login', {'form': LOGIN}),
+    ('web register form', 'GET', '/register', {}),
+    ('web register', 'POST', '/register', {'form': {'username': '{username}', 'password': BENCH_PASSWORD}}),
+    ('web add form', 'GET', '/add', {'auth': 'session'}),
+    ('web edit form', 'GET', '/edit/{id}', {'auth': 'session'}),
+    ('web add entry', 'POST', '/add', {'auth': 'session', 'form': ENTRY_BODY}),
+    ('web edit entry', 'POST', '/edit/{id}', {'auth': 'session', 'form': ENTRY_BODY}),
+]
+
+# Deletes go last; every endpoint deleting entries gets its own share of them
+WEB_DELETE_ENDPOINTS = [
+    ('web delete', 'GET', '/delete/{unused_id}', {'auth': 'session', 'share': (0, 2)}),
+]
+
+API_ENDPOINTS = WEB_ENDPOINTS + [
+    ('web index page', 'GET', '/?before={id}', {}),
+    ('healthz', 'GET', '/healthz', {}),
+    ('api login', 'POST', '/api/login', {'json': LOGIN}),
+    ('api list', 'GET', '/api/entries', {'auth': 'jwt'}),
+    ('api list page', 'GET', '/api/entries?after={id}&fields=title,category', {'auth': 'jwt'}),
+    ('api list category', 'GET', '/api/entries?category={category}', {'auth': 'jwt'}),
+    ('api get', 'GET', '/api/entries/{id}', {'auth': 'jwt'}),
+    ('api search', 'GET', '/api/entries/search?q={word}', {'auth': 'jwt'}),
+    ('api categories', 'GET', '/api/categories', {'auth': 'jwt'}),
+    ('api create', 'POST', '/api/entries', {'auth': 'jwt', 'json': dict(ENTRY_BODY, user_id='{user_id}')}),
+    ('api update', 'PUT', '/api/entries/{id}', {'auth': 'jwt', 'json': dict(ENTRY_BODY, user_id='{user_id}')}),
+    ('api bulk create', 'POST', '/api/entries/bulk', {'auth': 'jwt', 'json': {
+        'operations': [dict(ENTRY_BODY, op='create', user_id='{user_id}')] * 10}}),
+    ('api batch', 'POST', '/api/batch', {'auth': 'jwt', 'json': {'requests': [
+        {'method': 'GET', 'path': '/api/entries/{id}'},
+        {'method': 'GET', 'path': '/api/entries?category={category}'},
+        {'method': 'PUT', 'path': '/api/entries/{id}', 'body': dict(ENTRY_BODY, user_id='{user_id}')},
+    ]}}),
+    ('api export', 'GET', '/api/entries/export', {'auth': 'jwt'}),
+    ('api changes', 'GET', '/api/entries/changes', {'auth': 'jwt'}),
+    ('api token refresh', 'POST', '/api/token/refresh', {'auth': 'refresh'}),
+    ('api cache stats', 'GET', '/api/cache/stats', {'auth': 'jwt'}),
+    ('metrics', 'GET', '/metrics', {}),
+] + WEB_DELETE_ENDPOINTS + [
+    ('api delete', 'DELETE', '/api/entries/{unused_id}', {'auth': 'jwt', 'share': (1, 2)}),
+]
+
+APPS = {
+    # target is what Gunicorn would be given: module:expression
+    'flask-basics': {'target': 'app:app', 'init': ['-c', 'import app'],
+                     'endpoints': WEB_ENDPOINTS + WEB_DELETE_ENDPOINTS},
+    'flask-api': {'target': 'app:create_app()', 'init': ['-m', 'flask', '--app', 'app', 'init-db'],
+                  'endpoints': API_ENDPOINTS},
+    'dockerized-flask-api': {'target': 'main:app', 'init': ['-m', 'flask', '--app', 'main', 'init-db'],
+                             'endpoints': API_ENDPOINTS},
+}
+
+
+class RequestFactory:
+    """Fills in endpoint placeholders reproducibly.
+
+    Concurrent clients of one endpoint each get a factory with their own
+    ``seed`` and ``part`` ``(index, count)``, so their unused ids don't overlap.
+    """
+
+    def __init__(self, entry_ids, user_id, seed, part=(0, 1)):
+        self.entry_ids = entry_ids
+        self.user_id = user_id
+        self.seed = seed
+        self.part = part
+        self.rng = random.Random(seed)
+        self.counter = itertools.count()
+        self.unused = {}
+
+    def _unused_id(self, share):
+        if share not in self.unused:
+            ids = list(self.entry_ids[share[0]::share[1]][self.part[0]::self.part[1]])
+            self.rng.shuffle(ids)
+            self.unused[share] = iter(ids)
+        # Once the share is used up, 0 answers 404 and is counted as an error
+        return next(self.unused[share], 0)
+
+    def _values(self, path, options):
+        values = {
+            'id': self.rng.choice(self.entry_ids),
+            'category': quote(self.rng.choice(CATEGORIES)),
+            'word': quote(self.rng.choice(WORDS)),
+            'username': f'{BENCH_USER}-{self.seed}-{next(self.counter)}',
+        }
+        if '{unused_id}' in path:
+            # A list once the plan has been through JSON
+            values['unused_id'] = self._unused_id(tuple(options.get('share', (0, 1))))
+        return values
+
+    def _fill(self, value, values):
+        if isinstance(value, dict):
+            return {key: self._fill(item, values) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._fill(item, values) for item in value]
+        if value == '{user_id}':
+            return self.user_id
+        if isinstance(value, str):
+            return value.format(**values)
+        return value
+
+    def build(self, path, options):
+        values = self._values(path, options)
+        path = path.format(**values)
+        body = options.get('json') or options.get('form')
+        if body is not None:
+            body = self._fill(body, values)
+        return path, body
+
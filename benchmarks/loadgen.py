@@ -0,0 +1,115 @@
+"""A small closed-loop HTTP load generator on top of ``http.client``.
+
+Each of ``concurrency`` threads keeps one keep-alive connection open and
+sends its next request as soon as the previous response has been read, until
+the endpoint's request budget or time limit is used up.
+"""
+import http.client
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from endpoints import LOGIN, RequestFactory
+
+
+class Client:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.connection = None
+
+    def request(self, method, url, body=None, form=False, headers=None):
+        headers = dict(headers or {})
+        if body is not None:
+            if form:
+                body = urlencode(body)
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            else:
+                body = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.connection.request(method, url, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+            except (ConnectionError, http.client.HTTPException):
+                # The server closed the keep-alive connection; reconnect once
+                self.close()
+                if attempt:
+                    raise
+                continue
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+            return response, data
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def auth_headers(host, port, auth):
+    client = Client(host, port)
+    try:
+        if auth == 'session':
+            response, _ = client.request('POST', '/login', LOGIN, form=True)
+            cookie = response.getheader('Set-Cookie', '').split(';', 1)[0]
+            return {'Cookie': cookie}
+        if auth in ('jwt', 'refresh'):
+            _, data = client.request('POST', '/api/login', LOGIN)
+            token = json.loads(data)['refresh_token' if auth == 'refresh' else 'access_token']
+            return {'Authorization': f'Bearer {token}'}
+        return {}
+    finally:
+        client.close()
+
+
+def drive_http(host, port, plan, concurrency):
+    results = {}
+    for name, method, path, options in plan['endpoints']:
+        auth = options.get('auth')
+        if auth == 'refresh':
+            # A refresh token is only good once, so every connection follows its own chain
+            worker_headers = [auth_headers(host, port, auth) for _ in range(concurrency)]
+        else:
+            worker_headers = [auth_headers(host, port, auth)] * concurrency
+        budget = itertools.count()
+        lock = threading.Lock()
+        latencies, errors = [], []
+        started = time.perf_counter()
+
+        def worker(index):
+            client = Client(host, port)
+            headers = dict(worker_headers[index])
+            factory = RequestFactory(plan['entry_ids'], plan['user_id'], plan['seed'] + index,
+                                     part=(index, concurrency))
+            own_latencies, own_errors = [], 0
+            try:
+                while next(budget) < plan['requests'] and time.perf_counter() - started < plan['max_seconds']:
+                    url, body = factory.build(path, options)
+                    begin = time.perf_counter()
+                    try:
+                        response, data = client.request(method, url, body, form='form' in options, headers=headers)
+                        failed = response.status >= 400
+                    except OSError:
+                        failed = True
+                    own_latencies.append(time.perf_counter() - begin)
+                    own_errors += failed
+                    if not failed and auth == 'refresh':
+                        headers['Authorization'] = f"Bearer {json.loads(data)['refresh_token']}"
+            finally:
+                client.close()
+            with lock:
+                latencies.extend(own_latencies)
+                errors.append(own_errors)
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+        results[name] = {'latencies': latencies, 'errors': sum(errors),
+                         'elapsed': time.perf_counter() - started}
+    return results
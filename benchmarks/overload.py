@@ -0,0 +1,139 @@
+"""Overload an app over HTTP with and without admission control.
+
+    python benchmarks/overload.py                               # flask-api, 64 clients
+    python benchmarks/overload.py dockerized-flask-api --concurrency 128 --seconds 20
+
+``--concurrency`` closed-loop clients, each with its own keep-alive
+connection, send a mix of logins (password hashing) and list/search/create
+API requests for ``--seconds``, first with ``ADMISSION_ENABLED=0`` and then
+with it on. Per-identity rate limiting is switched off (``ADMISSION_RATE=0``)
+because every client is the same benchmark user; this measures the adaptive
+in-flight limit. A client that is turned away waits 50 ms before its next
+request, like a client honouring ``Retry-After`` would, only shorter.
+
+The report shows latency of admitted requests, how many were shed with
+429/503, and other errors. With admission control the admitted p99 should
+stay close to ``ADMISSION_LATENCY_TARGET`` instead of growing with the
+number of clients.
+"""
+import argparse
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from endpoints import APPS, LOGIN, RequestFactory
+from loadgen import Client, auth_headers
+from suite import DRIVER, free_port, prepare, wait_until_up
+
+MIX = [
+    ('POST', '/api/login', {'json': LOGIN}),
+    ('GET', '/api/entries', {'auth': 'jwt'}),
+    ('GET', '/api/entries/search?q={word}', {'auth': 'jwt'}),
+    ('GET', '/api/entries/{id}', {'auth': 'jwt'}),
+    ('POST', '/api/entries', {'auth': 'jwt', 'json': {'title': 'overload', 'category': 'Benchmarks',
+                                                      'content': 'written under load', 'user_id': '{user_id}'}}),
+]
+SHED = (429, 503)
+
+
+def run(app_name, app_dir, plan, args, admission):
+    port = free_port()
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}',
+                   APPS[app_name]['target']]
+    else:
+        command = [sys.executable, DRIVER, 'serve', APPS[app_name]['target'], str(port)]
+    env = dict(os.environ, APP_CONFIG='production', GUNICORN_ACCESS_LOG='/dev/null',
+               ADMISSION_ENABLED='1' if admission else '0', ADMISSION_RATE='0')
+    with open(os.path.join(app_dir, f'server-{admission}.log'), 'w') as log:
+        server = subprocess.Popen(command, cwd=app_dir, env=env, stdout=log, stderr=log)
+        try:
+            wait_until_up(port)
+            return drive(port, plan, args)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def drive(port, plan, args):
+    headers = auth_headers('127.0.0.1', port, 'jwt')
+    deadline = time.perf_counter() + args.seconds
+    admitted, shed, errors = [], [], []
+    lock = threading.Lock()
+
+    def client(index):
+        connection = Client('127.0.0.1', port)
+        factory = RequestFactory(range(*plan['entry_ids']), plan['user_id'], plan['seed'] + index)
+        own_admitted, own_shed, own_errors = [], 0, 0
+        try:
+            for method, path, options in itertools.cycle(MIX[index % len(MIX):] + MIX[:index % len(MIX)]):
+                if time.perf_counter() >= deadline:
+                    break
+                url, body = factory.build(path, options)
+                begin = time.perf_counter()
+                try:
+                    response, _ = connection.request(method, url, body,
+                                                     headers=headers if options.get('auth') else None)
+                    status = response.status
+                except OSError:
+                    status = None
+                elapsed = time.perf_counter() - begin
+                if status in SHED:
+                    own_shed += 1
+                    time.sleep(0.05)
+                elif status is None or status >= 400:
+                    own_errors += 1
+                else:
+                    own_admitted.append(elapsed)
+        finally:
+            connection.close()
+        with lock:
+            admitted.extend(own_admitted)
+            shed.append(own_shed)
+            errors.append(own_errors)
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(client, range(args.concurrency)))
+    return admitted, sum(shed), sum(errors)
+
+
+def report(label, admitted, shed, errors, seconds):
+    ms = sorted(latency * 1000 for latency in admitted)
+    if len(ms) > 1:
+        cuts = statistics.quantiles(ms, n=100, method='inclusive')
+        p50, p99 = cuts[49], cuts[98]
+    else:
+        p50 = p99 = ms[0] if ms else 0.0
+    print(f'{label:<14} {len(ms) / seconds:>10.1f} {p50:>9.1f} {p99:>9.1f} '
+          f'{(ms[-1] if ms else 0):>9.1f} {shed:>7} {errors:>7}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('app', nargs='?', default='flask-api', choices=['flask-api', 'dockerized-flask-api'])
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug')
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+    # What suite.prepare() expects
+    args.users, args.only, args.requests, args.max_seconds = 100, None, 0, 0
+
+    print(f"{args.app}: {args.concurrency} clients for {args.seconds:g} s ({args.server})")
+    print(f"{'admission':<14} {'ok req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'shed':>7} {'errors':>7}")
+    for admission in (False, True):
+        with tempfile.TemporaryDirectory(prefix='kb-bench-') as workdir:
+            app_dir, plan = prepare(args.app, workdir, args)
+            admitted, shed, errors = run(args.app, app_dir, plan, args, admission)
+        report('on' if admission else 'off', admitted, shed, errors, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
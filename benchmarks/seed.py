@@ -0,0 +1,111 @@
+"""Fill an app's SQLite database with deterministic users and entries.
+
+Rows are written straight through ``sqlite3`` in one transaction, so a
+million entries take seconds rather than going through the ORM one by one.
+Derived tables the apps keep up to date on write (the FTS5 search index and
+category counts) are rebuilt for the new rows afterwards.
+"""
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+BENCH_USER = 'bench'
+BENCH_PASSWORD = 'bench-password'
+
+CATEGORIES = [
+    'Vulnerabilities', 'Malware', 'Phishing', 'Cryptography', 'Forensics',
+    'Network Security', 'Web Security', 'Cloud Security', 'Incident Response',
+    'Threat Intelligence', 'Identity', 'Compliance', 'Reverse Engineering',
+    'Hardening', 'Red Team', 'Blue Team',
+]
+
+WORDS = (
+    'exploit payload buffer overflow injection token session cookie header '
+    'firewall packet port scan sandbox kernel patch privilege escalation '
+    'credential hash salt cipher certificate handshake replay nonce audit '
+    'logging alert beacon lateral movement persistence backdoor ransomware '
+    'phishing domain spoofing signature heuristic anomaly baseline endpoint '
+    'container registry secret rotation policy role access control review'
+).split()
+
+SNIPPET_LENGTH = 100
+BATCH_SIZE = 10000
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _columns(connection, table):
+    return [row[1] for row in connection.execute(f'PRAGMA table_info({table})')]
+
+
+def _table_exists(connection, name):
+    return connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+    ).fetchone() is not None
+
+
+def seed(db_path, users, entries, seed=1234):
+    """Add ``users`` users (the first one is the admin ``bench`` user) and ``entries`` entries.
+
+    Returns the ids of the new entries as a ``range``.
+    """
+    rng = random.Random(seed)
+    # One hash shared by every user: hashing a million passwords isn't what we measure
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    connection = sqlite3.connect(db_path)
+    try:
+        with connection:
+            first_user = connection.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM user').fetchone()[0]
+            connection.executemany(
+                'INSERT INTO user (id, username, password_hash, is_admin) VALUES (?, ?, ?, ?)',
+                ((first_user + i, BENCH_USER if i == 0 else f'user{first_user + i}', password_hash, i == 0)
+                 for i in range(users))
+            )
+
+            columns = _columns(connection, 'entry')
+            first_entry = connection.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM entry').fetchone()[0]
+            start = datetime(2024, 1, 1)
+
+            def rows():
+                for entry_id in range(first_entry, first_entry + entries):
+                    content = _text(rng, rng.randint(30, 120))
+                    row = {
+                        'id': entry_id,
+                        'title': _text(rng, rng.randint(3, 8))[:100],
+                        'category': rng.choice(CATEGORIES),
+                        'content': content,
+                        'date_created': (start + timedelta(minutes=entry_id)).isoformat(' '),
+                        'user_id': first_user + rng.randrange(users),
+                        'version': 1,
+                        'snippet': content[:SNIPPET_LENGTH],
+                    }
+                    yield tuple(row[name] for name in columns)
+
+            insert = (f"INSERT INTO entry ({', '.join(columns)}) "
+                      f"VALUES ({', '.join('?' for _ in columns)})")
+            batch = []
+            for row in rows():
+                batch.append(row)
+                if len(batch) == BATCH_SIZE:
+                    connection.executemany(insert, batch)
+                    batch = []
+            connection.executemany(insert, batch)
+
+            if _table_exists(connection, 'entry_fts'):
+                connection.execute(
+                    'INSERT INTO entry_fts (rowid, title, category, content) '
+                    'SELECT id, title, category, content FROM entry WHERE id >= ?', (first_entry,)
+                )
+            if _table_exists(connection, 'category_count'):
+                connection.execute('DELETE FROM category_count')
+                connection.execute(
+                    'INSERT INTO category_count (category, count) '
+                    'SELECT category, COUNT(*) FROM entry GROUP BY category'
+                )
+    finally:
+        connection.close()
+    return range(first_entry, first_entry + entries)
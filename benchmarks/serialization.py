@@ -0,0 +1,115 @@
+"""Compare ways of turning entry rows into a JSON list response.
+
+    python benchmarks/serialization.py                 # flask-api, 10k rows
+    python benchmarks/serialization.py dockerized-flask-api --rows 100000
+
+Reports CPU time per row and peak memory allocated (tracemalloc) for:
+
+- ``orm``: full ``Entry`` objects copied into hand-written dicts (the original code)
+- ``orm columns``: ``session.query(Entry.id, ...)`` column tuples
+- ``core``: Core ``select()`` through the shared serializer, stdlib ``json``
+- ``core + fast json``: the same with ``orjson`` (skipped if not installed)
+
+The app is copied to a temporary directory and seeded with ``seed.py``.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+APPS = {'flask-api': 'app', 'dockerized-flask-api': 'main'}
+FIELDS = ('id', 'title', 'category', 'content')
+
+
+def variants(db, Entry, serializers):
+    import json
+
+    def orm(limit):
+        entries = Entry.query.order_by(Entry.id).limit(limit).all()
+        return json.dumps([{'id': e.id, 'title': e.title, 'category': e.category, 'content': e.content}
+                           for e in entries])
+
+    def orm_columns(limit):
+        columns = [getattr(Entry, name) for name in FIELDS]
+        rows = db.session.query(*columns).order_by(Entry.id).limit(limit).all()
+        return json.dumps([dict(zip(FIELDS, row)) for row in rows])
+
+    def core(limit, dumps=lambda data: json.dumps(data)):
+        schema = serializers.ENTRY_SCHEMA
+        query = schema.select(FIELDS).order_by(serializers.entry_table.c.id).limit(limit)
+        return dumps(schema.dicts(FIELDS, db.session.execute(query).all()))
+
+    found = {'orm': orm, 'orm columns': orm_columns, 'core': core}
+    if serializers.orjson is not None:
+        found['core + fast json'] = lambda limit: core(limit, serializers.dumps)
+    return found
+
+
+def measure(fn, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.process_time()
+        fn(rows)
+        best = min(best, time.process_time() - start)
+    tracemalloc.start()
+    fn(rows)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def inside(rows, repeat):
+    """Runs in the app copy: import the app and time each variant."""
+    sys.path.insert(0, os.getcwd())
+    try:
+        import serializers
+        from app import create_app
+        from models import db, Entry
+    except ImportError:
+        from app import create_app, db, serializers
+        from app.models import Entry
+
+    app = create_app({'CACHE_TYPE': 'null', 'METRICS_ENABLED': False})
+    with app.app_context():
+        print(f"{'variant':<18} {'us/row':>8} {'peak KiB':>10}")
+        for name, fn in variants(db, Entry, serializers).items():
+            fn(rows)  # warm up
+            db.session.remove()
+            seconds, peak = measure(fn, rows, repeat)
+            db.session.remove()
+            print(f'{name:<18} {seconds / rows * 1e6:>8.2f} {peak / 1024:>10.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('app', nargs='?', default='flask-api', choices=list(APPS))
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--inside', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.inside:
+        return inside(args.rows, args.repeat)
+
+    sys.path.insert(0, HERE)
+    from seed import seed
+
+    with tempfile.TemporaryDirectory(prefix='kb-bench-') as workdir:
+        app_dir = os.path.join(workdir, args.app)
+        shutil.copytree(os.path.join(ROOT, args.app), app_dir,
+                        ignore=shutil.ignore_patterns('instance', '__pycache__'))
+        subprocess.run([sys.executable, '-m', 'flask', '--app', APPS[args.app], 'init-db'],
+                       cwd=app_dir, check=True, stdout=subprocess.DEVNULL)
+        seed(os.path.join(app_dir, 'instance', 'knowledge_base.db'), 10, args.rows)
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--inside',
+                        '--rows', str(args.rows), '--repeat', str(args.repeat)],
+                       cwd=app_dir, check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Measure how long a fresh worker takes from ``import`` to its first response.
+
+Each run starts a new Python process (like a Gunicorn worker or a new pod
+would), imports the app, calls ``create_app`` and serves ``GET /`` from an
+already initialized database through the test client:
+
+    python benchmarks/startup.py                # both apps, 10 runs each
+    python benchmarks/startup.py flask-api -n 30
+
+Nothing here needs network access.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+APPS = ('flask-api', 'dockerized-flask-api')
+
+# Both apps expose create_app()/init_db() from an importable ``app``
+# (a module in flask-api, a package in dockerized-flask-api).
+INIT = """
+import sys
+from app import create_app, init_db
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1]})
+with app.app_context():
+    init_db()
+"""
+
+STARTUP = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1]})
+created = time.perf_counter()
+response = app.test_client().get('/')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'total': served - start,
+}))
+"""
+
+
+def run(app_dir, code, uri):
+    result = subprocess.run(
+        [sys.executable, '-c', code, uri],
+        cwd=os.path.join(ROOT, app_dir), capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def bench(app_dir, runs):
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = 'sqlite:///' + os.path.join(tmp, 'startup.db')
+        run(app_dir, INIT, uri)
+        samples = [json.loads(run(app_dir, STARTUP, uri)) for _ in range(runs)]
+    return {phase: [sample[phase] * 1000 for sample in samples] for phase in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('apps', nargs='*', metavar='app', help=f"any of {', '.join(APPS)} (default: all)")
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    args = parser.parse_args()
+    unknown = set(args.apps) - set(APPS)
+    if unknown:
+        parser.error(f"unknown app: {', '.join(sorted(unknown))}")
+
+    print(f"{'app':<22} {'phase':<14} {'median ms':>10} {'max ms':>10}")
+    for app_dir in args.apps or APPS:
+        for phase, times in bench(app_dir, args.runs).items():
+            print(f"{app_dir:<22} {phase:<14} {statistics.median(times):>10.1f} {max(times):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
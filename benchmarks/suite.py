@@ -0,0 +1,234 @@
+"""Benchmark every web route and API resource of the three apps.
+
+For each app the suite copies its directory to a temporary folder (the
+committed databases are never touched), creates the database the way the app
+does, seeds it with ``--users`` users and ``--entries`` entries, and then
+sends ``--requests`` requests to every endpoint, either in-process through
+Flask's test client (``--mode wsgi``), over HTTP to a local server with
+``--concurrency`` keep-alive connections (``--mode http``), or both.
+
+    python benchmarks/suite.py                                  # all apps, WSGI
+    python benchmarks/suite.py flask-api --entries 100000 --mode both
+    python benchmarks/suite.py --output before.json
+    python benchmarks/suite.py --baseline before.json           # exit 1 on regressions
+
+Everything runs locally; nothing is fetched from the network.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+from endpoints import APPS
+from loadgen import drive_http
+from seed import seed
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HERE = os.path.dirname(os.path.abspath(__file__))
+DRIVER = os.path.join(HERE, 'driver.py')
+
+
+def prepare(app_name, workdir, args):
+    """Copy the app, create its database and seed it. Returns the request plan."""
+    app_dir = os.path.join(workdir, app_name)
+    shutil.copytree(os.path.join(ROOT, app_name), app_dir,
+                    ignore=shutil.ignore_patterns('instance', '__pycache__'))
+    subprocess.run([sys.executable] + APPS[app_name]['init'], cwd=app_dir, check=True,
+                   stdout=subprocess.DEVNULL)
+    entry_ids = seed(os.path.join(app_dir, 'instance', 'knowledge_base.db'),
+                     args.users, args.entries, args.seed)
+    endpoints = [endpoint for endpoint in APPS[app_name]['endpoints']
+                 if not args.only or any(word in endpoint[0] for word in args.only)]
+    return app_dir, {
+        'endpoints': endpoints,
+        'entry_ids': [entry_ids.start, entry_ids.stop],
+        'user_id': 1,
+        'requests': args.requests,
+        'max_seconds': args.max_seconds,
+        'seed': args.seed,
+    }
+
+
+def app_env(args):
+    env = dict(os.environ, GUNICORN_ACCESS_LOG='/dev/null')
+    if not args.admission:
+        # Every request comes from one user, who would soon be rate limited
+        env['ADMISSION_ENABLED'] = '0'
+    return env
+
+
+def run_wsgi(app_name, app_dir, plan, args):
+    plan_path = os.path.join(app_dir, 'benchmark-plan.json')
+    with open(plan_path, 'w') as f:
+        json.dump(plan, f)
+    result = subprocess.run([sys.executable, DRIVER, 'wsgi', APPS[app_name]['target'], plan_path],
+                            cwd=app_dir, env=app_env(args), check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def run_http(app_name, app_dir, plan, args):
+    port = free_port()
+    target = APPS[app_name]['target']
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-b', f'127.0.0.1:{port}', target]
+        if os.path.exists(os.path.join(app_dir, 'gunicorn.conf.py')):
+            command[3:3] = ['-c', 'gunicorn.conf.py']
+    else:
+        command = [sys.executable, DRIVER, 'serve', target, str(port)]
+    env = app_env(args)
+    with open(os.path.join(app_dir, 'server.log'), 'w') as log:
+        server = subprocess.Popen(command, cwd=app_dir, env=env, stdout=log, stderr=log)
+        try:
+            wait_until_up(port)
+            plan = dict(plan, entry_ids=range(*plan['entry_ids']))
+            return drive_http('127.0.0.1', port, plan, args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def summarize(raw):
+    latencies = sorted(raw['latencies'])
+    if not latencies:
+        return {'requests': 0, 'errors': raw['errors']}
+    ms = [latency * 1000 for latency in latencies]
+    if len(ms) > 1:
+        cuts = statistics.quantiles(ms, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = ms[0]
+    return {
+        'requests': len(ms),
+        'errors': raw['errors'],
+        'throughput': round(len(ms) / raw['elapsed'], 1),
+        'mean_ms': round(statistics.fmean(ms), 2),
+        'p50_ms': round(p50, 2),
+        'p95_ms': round(p95, 2),
+        'p99_ms': round(p99, 2),
+    }
+
+
+def change(new, old):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(stats, baseline, threshold):
+    """Mark endpoints whose p95 grew, or throughput fell, by more than ``threshold`` percent."""
+    if not baseline or 'p95_ms' not in stats or 'p95_ms' not in baseline:
+        return ''
+    p95 = change(stats['p95_ms'], baseline['p95_ms'])
+    throughput = change(stats['throughput'], baseline['throughput'])
+    flag = '  REGRESSION' if p95 > threshold or -throughput > threshold else ''
+    return f'  p95 {p95:+.0f}%  rps {throughput:+.0f}%{flag}'
+
+
+def print_table(app_name, mode, results, baseline, threshold):
+    print(f'\n{app_name} ({mode})')
+    print(f"  {'endpoint':<20} {'reqs':>6} {'errs':>5} {'req/s':>9} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    regressions = 0
+    for name, stats in results.items():
+        if not stats['requests']:
+            print(f"  {name:<20} {0:>6} {stats['errors']:>5}")
+            continue
+        note = compare(stats, baseline.get(name), threshold)
+        regressions += 'REGRESSION' in note
+        print(f"  {name:<20} {stats['requests']:>6} {stats['errors']:>5} {stats['throughput']:>9.1f} "
+              f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}{note}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('apps', nargs='*', metavar='app', help=f"any of {', '.join(APPS)} (default: all)")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--entries', type=int, default=1000, help='1000 to 1000000 is a sensible range')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--max-seconds', type=float, default=30, help='time limit per endpoint')
+    parser.add_argument('--mode', choices=('wsgi', 'http', 'both'), default='wsgi')
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug',
+                        help='server used in http mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='connections in http mode')
+    parser.add_argument('--only', nargs='+', metavar='WORD', help='only endpoints whose name contains WORD')
+    parser.add_argument('--admission', action='store_true',
+                        help="keep the apps' admission control on (it rate limits the benchmark user)")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help='save results as JSON')
+    parser.add_argument('--baseline', help='results JSON from an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=10, help='percent change counted as a regression')
+    args = parser.parse_args()
+    unknown = set(args.apps) - set(APPS)
+    if unknown:
+        parser.error(f"unknown app: {', '.join(sorted(unknown))}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta']['entries'] != args.entries or baseline['meta']['users'] != args.users:
+            print('warning: baseline was recorded with a different data size', file=sys.stderr)
+        baseline = baseline['results']
+
+    modes = ('wsgi', 'http') if args.mode == 'both' else (args.mode,)
+    output = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            **{key: getattr(args, key) for key in
+               ('users', 'entries', 'requests', 'concurrency', 'server', 'seed')},
+        },
+        'results': {},
+    }
+    regressions = 0
+    for app_name in args.apps or APPS:
+        for mode in modes:
+            # A fresh copy per mode so writes from one run don't skew the next
+            with tempfile.TemporaryDirectory(prefix='kb-bench-') as workdir:
+                app_dir, plan = prepare(app_name, workdir, args)
+                if mode == 'wsgi':
+                    raw = run_wsgi(app_name, app_dir, plan, args)
+                else:
+                    raw = run_http(app_name, app_dir, plan, args)
+            results = {name: summarize(data) for name, data in raw.items()}
+            output['results'].setdefault(app_name, {})[mode] = results
+            regressions += print_table(app_name, mode, results,
+                                       baseline.get(app_name, {}).get(mode, {}), args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    if regressions:
+        print(f'\n{regressions} endpoint(s) regressed by more than {args.threshold:g}%')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Concurrent entry inserts over HTTP with and without write batching.
+
+    python benchmarks/writes.py                                  # flask-api, 1/8/32 clients
+    python benchmarks/writes.py dockerized-flask-api --server gunicorn --concurrency 4 16 64
+
+For each concurrency level the app is started twice (``APP_CONFIG=production``,
+admission control off), once committing every ``POST /api/entries`` on its
+own and once with ``WRITE_BATCHING=1``, and ``--requests`` inserts are sent.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from endpoints import APPS
+from loadgen import drive_http
+from suite import DRIVER, free_port, prepare, summarize, wait_until_up
+
+
+def run(app_name, app_dir, plan, args, concurrency, batching):
+    port = free_port()
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-b', f'127.0.0.1:{port}', APPS[app_name]['target']]
+        if os.path.exists(os.path.join(app_dir, 'gunicorn.conf.py')):
+            command[3:3] = ['-c', 'gunicorn.conf.py']
+    else:
+        command = [sys.executable, DRIVER, 'serve', APPS[app_name]['target'], str(port)]
+    env = dict(os.environ, APP_CONFIG='production', GUNICORN_ACCESS_LOG='/dev/null',
+               ADMISSION_ENABLED='0', WRITE_BATCHING='1' if batching else '0')
+    with open(os.path.join(app_dir, 'server.log'), 'a') as log:
+        server = subprocess.Popen(command, cwd=app_dir, env=env, stdout=log, stderr=log)
+        try:
+            wait_until_up(port)
+            plan = dict(plan, entry_ids=range(*plan['entry_ids']))
+            return drive_http('127.0.0.1', port, plan, concurrency)['api create']
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('app', nargs='?', default='flask-api', choices=['flask-api', 'dockerized-flask-api'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=2000, help='inserts per run')
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug')
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+    # What suite.prepare() expects
+    args.users, args.only, args.max_seconds = 100, ['api create'], 120
+
+    print(f"{args.app}: {args.requests} inserts per run ({args.server})")
+    print(f"{'clients':>7} {'batching':>9} {'errs':>5} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for concurrency in args.concurrency:
+        for batching in (False, True):
+            with tempfile.TemporaryDirectory(prefix='kb-bench-') as workdir:
+                app_dir, plan = prepare(args.app, workdir, args)
+                stats = summarize(run(args.app, app_dir, plan, args, concurrency, batching))
+            print(f"{concurrency:>7} {'on' if batching else 'off':>9} {stats['errors']:>5} "
+                  f"{stats.get('throughput', 0):>9.1f} {stats.get('p50_ms', 0):>9.2f} {stats.get('p99_ms', 0):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,65 +1,87 @@
 # app/__init__.py
-from flask import Flask
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_jwt_extended import JWTManager
 from flask_restful import Api
-from datetime import timedelta
+from werkzeug.local import LocalProxy
+from datetime import datetime
 import os
 
+from .admission import init_admission
+from .assets import init_assets
+from .batch import init_batch
+from .cache import make_cache, invalidate_on_commit
+from .compression import init_compression
+from .config import load_config
+from .database import RoutingSession, configure_engines, init_engine_config
+from .metrics import init_metrics
+from .passwords import PasswordHasher
+
 
 # Get absolute path to root folder
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
-app = Flask(
-    __name__,
-    template_folder=os.path.join(project_root, 'templates'),
-    static_folder=os.path.join(project_root, 'static')
-)
-# Initialize Flask app
-app = Flask(__name__,template_folder='../templates',static_folder='../static')
-app.config.from_mapping(
-    SECRET_KEY='your-secret-key-here',
-    SQLALCHEMY_DATABASE_URI='sqlite:///knowledge_base.db',
-    SQLALCHEMY_TRACK_MODIFICATIONS=False,
-    JWT_SECRET_KEY='your-jwt-secret-key-here',
-    JWT_ACCESS_TOKEN_EXPIRES=timedelta(minutes=5)
-)
-
-# Initialize extensions
-db = SQLAlchemy(app)
-login_manager = LoginManager(app)
-jwt = JWTManager(app)
-api = Api(app)
+# Initialize extensions (bound to an app in create_app)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+login_manager = LoginManager()
+login_manager.login_view = 'login'
+jwt = JWTManager()
+
+# The cache, password hasher and token blocklist are built from each app's config
+cache = LocalProxy(lambda: current_app.extensions['cache'])
+hasher = LocalProxy(lambda: current_app.extensions['password_hasher'])
+blocklist = LocalProxy(lambda: current_app.extensions['token_blocklist'])
 
 # Import login manager user loader
-from .models import User
+from .models import Entry, User, UserIdentity
+from .tokens import Blocklist
+from .writes import init_writes
+from .changes import init_changes
+
+invalidate_on_commit(cache, Entry)
+invalidate_on_commit(cache, User)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    data = cache.get(f'user:{user_id}')
+    if data is None:
+        user = db.session.get(User, int(user_id))
+        if user is None:
+            return None
+        data = {'id': user.id, 'username': user.username, 'is_admin': bool(user.is_admin)}
+        cache.set(f'user:{user_id}', data)
+    return UserIdentity(**data)
 
-# Context processor for year
-from datetime import datetime
+@jwt.token_in_blocklist_loader
+def token_revoked(jwt_header, jwt_payload):
+    return blocklist.is_revoked(jwt_payload['jti'])
 
-@app.context_processor
+# Context processor for year
 def inject_year():
     return {'current_year': datetime.now().year}
 
 # Import models, routes, and API resources
-from .routes import index, add_entry, edit_entry, delete_entry, login, logout, register
-from .apis import ApiLoginResource, EntryListResource, EntryResource
+from .routes import register_routes
+from .search import init_search_index
+from .migrations import migrate
+from .apis import register_resources
+
 
-# Register API resources
-api.add_resource(ApiLoginResource, '/api/login')
-api.add_resource(EntryListResource, '/api/entries')
-api.add_resource(EntryResource, '/api/entries/<int:entry_id>')
+def init_db():
+    """Create tables, apply migrations, build the search index and seed the admin user.
 
-# Create DB and seed admin on startup
-with app.app_context():
-    db.create_all()
+    Safe to run again. Needs an app context; ``create_app`` never calls it, so
+    importing the app or starting a worker doesn't touch the database.
+    """
+    # The read bind points at the same database, so only create tables once
+    db.create_all(bind_key=None)
+    for description in migrate():
+        print(f"Applied migration {description}")
+    init_search_index()
 
-    from .models import db, User
     if not User.query.filter_by(username='admin').first():
         admin = User(username='admin')
         admin.set_password('admin123')  # Change before production!
@@ -68,4 +90,48 @@ with app.app_context():
         db.session.commit()
         print("Admin user created.")
     else:
-        print("Admin user already exists.")
\ No newline at end of file
+        print("Admin user already exists.")
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create or upgrade the database (flask --app main init-db)."""
+    init_db()
+
+
+def create_app(config=None):
+    """Build the app. ``config`` is a preset name, config class or dict of overrides."""
+    app = Flask(
+        __name__,
+        template_folder=os.path.join(project_root, 'templates'),
+        static_folder=os.path.join(project_root, 'static')
+    )
+    app.config.from_object(load_config(config))
+    init_engine_config(app.config)
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    jwt.init_app(app)
+    app.extensions['cache'] = make_cache(app.config)
+    app.extensions['password_hasher'] = PasswordHasher.from_config(app.config)
+    app.extensions['token_blocklist'] = Blocklist.from_config(app.config)
+
+    api = Api(app)
+    register_resources(api)
+    register_routes(app)
+    app.context_processor(inject_year)
+    app.cli.add_command(init_db_command)
+    init_metrics(app)
+    init_admission(app)
+    init_compression(app)
+    init_assets(app)
+    init_writes(app)
+    init_changes(app)
+    init_batch(app)
+
+    # Only registers connect hooks; no connection is opened until a request needs one
+    with app.app_context():
+        configure_engines(db, app.config)
+
+    return app
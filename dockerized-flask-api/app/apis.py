@@ -1,9 +1,24 @@
 # app/api.py
 from flask_restful import Resource, reqparse
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
-from flask import request
-from . import db
-from .models import Entry, User
+from flask_jwt_extended import (
+    jwt_required, get_jwt, get_jwt_identity, create_access_token, create_refresh_token
+)
+from sqlalchemy.exc import SQLAlchemyError
+from flask import Response, abort, current_app, request, stream_with_context
+from sqlalchemy import text
+from sqlalchemy.orm import undefer
+from werkzeug.http import quote_etag
+import hashlib
+import time
+from . import db, blocklist, cache, hasher
+from .admission import charge
+from .batch import run_batch
+from .changes import change_cursor, change_stream_response, fetch_changes
+from .models import CategoryCount, Entry, User
+from .search import search_entries
+from .serializers import ENTRY_SCHEMA, dumps, entry_table, output_json
+from .database import read_only
+from .writes import insert_entry, remove_entry, update_entry, write
 
 # Parser for entry data
 entry_parser = reqparse.RequestParser()
@@ -12,6 +27,136 @@ entry_parser.add_argument('category', required=True)
 entry_parser.add_argument('content', required=True)
 entry_parser.add_argument('user_id', type=int, required=True)
 
+# Parser for list pagination (keyset on Entry.id) and field projection
+# ``author`` is the author's username, joined in the same query
+ENTRY_FIELDS = ('id', 'title', 'category', 'content', 'author')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+list_parser = reqparse.RequestParser()
+list_parser.add_argument('limit', type=int, location='args', default=DEFAULT_PAGE_SIZE)
+list_parser.add_argument('after', type=int, location='args', default=0)
+list_parser.add_argument('fields', location='args')
+list_parser.add_argument('category', location='args')
+list_parser.add_argument('user_id', type=int, location='args')
+
+# Parser for the change feed; without ``since`` it starts at the newest change
+changes_parser = reqparse.RequestParser()
+changes_parser.add_argument('since', type=int, location='args')
+changes_parser.add_argument('limit', type=int, location='args', default=DEFAULT_PAGE_SIZE)
+changes_parser.add_argument('fields', location='args')
+
+search_parser = reqparse.RequestParser()
+search_parser.add_argument('q', location='args', required=True)
+search_parser.add_argument('limit', type=int, location='args', default=DEFAULT_PAGE_SIZE)
+search_parser.add_argument('offset', type=int, location='args', default=0)
+
+
+def parse_fields(fields):
+    """Turn a ``fields=title,category`` value into a tuple of column names."""
+    if not fields:
+        return ENTRY_FIELDS
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in ENTRY_FIELDS]
+    if unknown:
+        return None
+    # The id is always returned because it is the pagination cursor
+    return ('id',) + tuple(name for name in ENTRY_FIELDS if name in names and name != 'id')
+
+
+# Streaming export (one JSON document per line)
+NDJSON_MIMETYPE = 'application/x-ndjson'
+EXPORT_CHUNK_SIZE = 500
+
+
+def stream_entries(fields):
+    """Yield entries as NDJSON lines, fetching rows from the DB in chunks."""
+    query = (ENTRY_SCHEMA.select(fields)
+             .order_by(entry_table.c.id)
+             .execution_options(stream_results=True, yield_per=EXPORT_CHUNK_SIZE))
+    for row in db.session.execute(query):
+        yield dumps(dict(zip(fields, row))) + b'\n'
+
+
+def export_response(fields):
+    return Response(stream_with_context(stream_entries(fields)), mimetype=NDJSON_MIMETYPE)
+
+
+# Bulk create/update/delete
+MAX_BULK_OPERATIONS = 1000
+BULK_MODES = ('atomic', 'best_effort')
+BULK_REQUIRED_FIELDS = {
+    'create': ('title', 'category', 'content', 'user_id'),
+    'update': ('id', 'title', 'category', 'content'),
+    'delete': ('id',),
+}
+
+
+def validate_bulk_operation(op):
+    """Return an error message for a malformed bulk operation, or None."""
+    if not isinstance(op, dict) or not isinstance(op.get('op'), str) or op['op'] not in BULK_REQUIRED_FIELDS:
+        return "op must be one of create, update, delete"
+    missing = [name for name in BULK_REQUIRED_FIELDS[op['op']] if op.get(name) in (None, '')]
+    if missing:
+        return f"Missing required fields: {', '.join(missing)}"
+    for name in BULK_REQUIRED_FIELDS[op['op']]:
+        if name in ('id', 'user_id'):
+            # bool is an int subclass, but true isn't an id
+            if not isinstance(op[name], int) or isinstance(op[name], bool):
+                return f"{name} must be an integer"
+        elif not isinstance(op[name], str):
+            return f"{name} must be a string"
+    return None
+
+
+def bulk_result(index, status, **extra):
+    return dict(index=index, status=status, **extra)
+
+
+def can_modify(owner_id):
+    """Owners and admins may change an entry; decided from the JWT claims alone."""
+    claims = get_jwt()
+    return bool(claims.get('is_admin')) or claims.get('user_id') == owner_id
+
+
+# Conditional GET support
+def not_modified(etag):
+    """Return a bodiless 304 response if the client already has ``etag``.
+
+    Compressed responses carry a weak version of the same ETag, so the
+    comparison ignores weakness.
+    """
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers={'ETag': quote_etag(etag)})
+    return None
+
+
+def entry_page_versions(after, limit, category=None, user_id=None):
+    """``id.version`` of a list page's rows (and the next one), read from the index only."""
+    conditions = ['id > :after']
+    if category is not None:
+        conditions.append('category = :category')
+    if user_id is not None:
+        conditions.append('user_id = :user_id')
+    return db.session.execute(
+        text("SELECT group_concat(id || '.' || version) FROM "
+             f"(SELECT id, version FROM entry WHERE {' AND '.join(conditions)} "
+             "ORDER BY id LIMIT :limit)"),
+        {'after': after, 'limit': limit + 1, 'category': category, 'user_id': user_id}
+    ).scalar() or ''
+
+
+def entry_page_etag(after, limit, fields, category, user_id, versions):
+    """Fingerprint a list page from the ids and versions of its rows only."""
+    key = f"{after}:{limit}:{','.join(fields)}:{category}:{user_id}:{versions}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def issue_tokens(identity, claims):
+    return {
+        'access_token': create_access_token(identity=identity, additional_claims=claims),
+        'refresh_token': create_refresh_token(identity=identity, additional_claims=claims),
+    }
+
 # API Resources
 class ApiLoginResource(Resource):
     def post(self):
@@ -20,63 +165,366 @@ class ApiLoginResource(Resource):
 
         user = User.query.filter_by(username=username).first()
 
-        if user and user.check_password(password):
-            from flask_jwt_extended import create_access_token
-            claims = {"is_admin": user.is_admin}
-            access_token = create_access_token(identity=user.username, additional_claims=claims)
-            return {'access_token': access_token}, 200
+        if user and hasher.verify_user(user, password):
+            db.session.commit()  # Persists a rehashed password, if any
+            claims = {"is_admin": user.is_admin, "user_id": user.id}
+            return issue_tokens(user.username, claims), 200
 
         return {'message': 'Invalid username or password'}, 401
 
 
+class TokenRefreshResource(Resource):
+    """Swap a refresh token for a new access and refresh token, without a password check."""
+
+    @jwt_required(refresh=True)
+    def post(self):
+        claims = get_jwt()
+        # A primary-key lookup (no password hash), so deleted users can't
+        # keep refreshing and admin rights follow the user row
+        user = db.session.get(User, claims['user_id']) if claims.get('user_id') is not None else None
+        if user is None or user.username != get_jwt_identity():
+            return {'message': 'User no longer exists'}, 401
+        # Rotation: each refresh token works once, even when requests race
+        if not blocklist.revoke(claims):
+            return {'message': 'Refresh token has already been used'}, 401
+        return issue_tokens(user.username, {'is_admin': user.is_admin, 'user_id': user.id}), 200
+
+
+class TokenRevokeResource(Resource):
+    """Log out: revoke the access or refresh token sent with the request."""
+
+    @jwt_required(verify_type=False)
+    def post(self):
+        blocklist.revoke(get_jwt())
+        return {'message': 'Token revoked'}, 200
+
+
 class EntryListResource(Resource):
     @jwt_required()
+    @read_only
     def get(self):
-        entries = Entry.query.all()
-        return [{
-            'id': e.id,
-            'title': e.title,
-            'category': e.category,
-            'content': e.content
-        } for e in entries]
+        args = list_parser.parse_args()
+        limit = max(1, min(args['limit'], MAX_PAGE_SIZE))
+        fields = parse_fields(args['fields'])
+        if fields is None:
+            return {'message': 'Unknown field requested'}, 400
+
+        if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+            return export_response(fields)
+
+        category, user_id = args['category'], args['user_id']
+        cache_key = (f"entry:list:{cache.generation('entry')}:"
+                     f"{args['after']}:{limit}:{','.join(fields)}:{category}:{user_id}")
+        page = cache.get(cache_key)
+        if page is None:
+            if request.if_none_match:
+                # Revalidation: an index-only query may spare fetching the rows
+                versions = entry_page_versions(args['after'], limit, category, user_id)
+                cached = not_modified(entry_page_etag(args['after'], limit, fields, category, user_id, versions))
+                if cached is not None:
+                    return cached
+
+            # Only SELECT the requested columns (plus the version, for the
+            # ETag) and fetch one extra row to know whether another page exists.
+            query = ENTRY_SCHEMA.select(fields + ('version',)).where(entry_table.c.id > args['after'])
+            # Served by the (category, id) and user_id indexes
+            if category is not None:
+                query = query.where(entry_table.c.category == category)
+            if user_id is not None:
+                query = query.where(entry_table.c.user_id == user_id)
+            rows = db.session.execute(query.order_by(entry_table.c.id).limit(limit + 1)).all()
+            versions = ','.join(f'{row[0]}.{row[-1]}' for row in rows)
+            etag = entry_page_etag(args['after'], limit, fields, category, user_id, versions)
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            page = {
+                'etag': etag,
+                'body': {
+                    'entries': ENTRY_SCHEMA.dicts(fields, rows),
+                    'next_after': rows[-1][0] if has_more else None
+                }
+            }
+            cache.set(cache_key, page)
+
+        cached = not_modified(page['etag'])
+        if cached is not None:
+            return cached
+        return page['body'], 200, {'ETag': quote_etag(page['etag'])}
 
     @jwt_required()
     def post(self):
         data = entry_parser.parse_args()
-        user = User.query.get(data['user_id'])
-        if not user:
+        # The caller's own id comes from the token, so only look up other users
+        if data['user_id'] != get_jwt().get('user_id') and not db.session.get(User, data['user_id']):
             return {'message': 'User not found'}, 404
 
-        new_entry = Entry(**data)
-        db.session.add(new_entry)
-        db.session.commit()
-        return {'message': 'Entry created', 'id': new_entry.id}, 201
+        entry_id = write(insert_entry, dict(data))
+        return {'message': 'Entry created', 'id': entry_id}, 201
 
 
-class EntryResource(Resource):
+class EntryBulkResource(Resource):
     @jwt_required()
-    def get(self, entry_id):
-        entry = Entry.query.get_or_404(entry_id)
+    def post(self):
+        payload = request.get_json(silent=True) or {}
+        if not isinstance(payload, dict):
+            return {'message': 'Request body must be a JSON object'}, 400
+        operations = payload.get('operations')
+        mode = payload.get('mode', 'atomic')
+        if not isinstance(operations, list) or not operations:
+            return {'message': 'operations must be a non-empty list'}, 400
+        if len(operations) > MAX_BULK_OPERATIONS:
+            return {'message': f'At most {MAX_BULK_OPERATIONS} operations per request'}, 400
+        if mode not in BULK_MODES:
+            return {'message': f"mode must be one of {', '.join(BULK_MODES)}"}, 400
+
+        results = [validate_bulk_operation(op) for op in operations]
+
+        # Resolve every referenced user and entry with one query each
+        user_ids = {op['user_id'] for op, err in zip(operations, results)
+                    if err is None and op['op'] == 'create'}
+        entry_ids = {op['id'] for op, err in zip(operations, results)
+                     if err is None and op['op'] != 'create'}
+        known_users = {row.id for row in
+                       db.session.query(User.id).filter(User.id.in_(user_ids))} if user_ids else set()
+        entry_query = Entry.query.filter(Entry.id.in_(entry_ids))
+        if any(op['op'] == 'update' for op, err in zip(operations, results) if err is None):
+            # So that unchanged content doesn't count as a change
+            entry_query = entry_query.options(undefer(Entry.content))
+        entries = {entry.id: entry for entry in entry_query} if entry_ids else {}
+
+        deleted = set()
+        for index, op in enumerate(operations):
+            if results[index] is not None:
+                continue
+            if op['op'] == 'create':
+                if op['user_id'] not in known_users:
+                    results[index] = 'User not found'
+            elif op['id'] not in entries or op['id'] in deleted:
+                results[index] = 'Entry not found'
+            elif not can_modify(entries[op['id']].user_id):
+                results[index] = 'Permission denied'
+            elif op['op'] == 'delete':
+                deleted.add(op['id'])
+
+        if mode == 'atomic' and any(results):
+            return {'results': [bulk_result(i, 'error', message=err)
+                                for i, err in enumerate(results) if err]}, 400
+
+        applied = []
+        for index, op in enumerate(operations):
+            if results[index] is not None:
+                continue
+            if op['op'] == 'create':
+                entry = Entry(title=op['title'], category=op['category'],
+                              content=op['content'], user_id=op['user_id'])
+                db.session.add(entry)
+                applied.append((index, 'created', entry))
+            elif op['op'] == 'update':
+                entry = entries[op['id']]
+                entry.title = op['title']
+                entry.category = op['category']
+                entry.content = op['content']
+                applied.append((index, 'updated', entry))
+            else:
+                entry = entries[op['id']]
+                db.session.delete(entry)
+                applied.append((index, 'deleted', entry))
+
+        # Everything goes out in a single transaction (one commit, one fsync)
+        try:
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            return {'message': 'Bulk operation failed, nothing was applied'}, 500
+
+        output = [bulk_result(i, 'error', message=err) for i, err in enumerate(results) if err]
+        output += [bulk_result(i, status, id=entry.id) for i, status, entry in applied]
+        output.sort(key=lambda result: result['index'])
+        return {'results': output}, 200
+
+
+CHANGES_PRUNED = 'Changes since then are no longer kept; export the entries and start again without since'
+
+
+class EntryChangesResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self):
+        args = changes_parser.parse_args()
+        limit = max(1, min(args['limit'], MAX_PAGE_SIZE))
+        fields = parse_fields(args['fields'])
+        if fields is None:
+            return {'message': 'Unknown field requested'}, 400
+        since = change_cursor(args['since'])
+        if since is None:
+            return {'message': CHANGES_PRUNED}, 410
+
+        changes = fetch_changes(since, fields, limit + 1)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
         return {
-            'id': entry.id,
-            'title': entry.title,
-            'category': entry.category,
-            'content': entry.content
+            'changes': changes,
+            'next_since': changes[-1]['seq'] if changes else since,
+            'has_more': has_more
         }
 
+
+class EntryChangeStreamResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self):
+        args = changes_parser.parse_args()
+        fields = parse_fields(args['fields'])
+        if fields is None:
+            return {'message': 'Unknown field requested'}, 400
+        # An EventSource that reconnects says where it got to
+        since = request.headers.get('Last-Event-ID', args['since'], type=int)
+        since = change_cursor(since)
+        if since is None:
+            return {'message': CHANGES_PRUNED}, 410
+        # Ends when the token expires at the latest, so the client has to
+        # come back with a valid one
+        max_age = min(current_app.config['CHANGE_STREAM_MAX_AGE'], get_jwt()['exp'] - time.time())
+        response = change_stream_response(since, fields, max_age, MAX_PAGE_SIZE)
+        if response is None:
+            return {'message': 'Too many change streams open, please try again shortly.'}, 503, {'Retry-After': '1'}
+        return response
+
+
+class EntryExportResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self):
+        fields = parse_fields(request.args.get('fields'))
+        if fields is None:
+            return {'message': 'Unknown field requested'}, 400
+        return export_response(fields)
+
+
+class EntrySearchResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self):
+        args = search_parser.parse_args()
+        if not args['q'].strip():
+            return {'message': 'Search query must not be empty'}, 400
+        limit = max(1, min(args['limit'], MAX_PAGE_SIZE))
+        offset = max(0, args['offset'])
+
+        rows, has_more = search_entries(args['q'], limit, offset)
+        return {
+            'entries': [dict(row._mapping) for row in rows],
+            'next_offset': offset + limit if has_more else None
+        }
+
+
+class CacheStatsResource(Resource):
+    @jwt_required()
+    def get(self):
+        return cache.stats()
+
+
+class CategoryListResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self):
+        cache_key = f"entry:categories:{cache.generation('entry')}"
+        categories = cache.get(cache_key)
+        if categories is None:
+            # Counts are kept up to date on every write, so this never scans entry
+            rows = CategoryCount.query.order_by(CategoryCount.category).all()
+            categories = [{'category': row.category, 'count': row.count} for row in rows]
+            cache.set(cache_key, categories)
+        return {'categories': categories}
+
+
+class BatchResource(Resource):
+    @jwt_required()
+    def post(self):
+        payload = request.get_json(silent=True) or {}
+        if not isinstance(payload, dict):
+            return {'message': 'Request body must be a JSON object'}, 400
+        specs = payload.get('requests')
+        if not isinstance(specs, list) or not specs:
+            return {'message': 'requests must be a non-empty list'}, 400
+        max_requests = current_app.config['BATCH_MAX_REQUESTS']
+        if len(specs) > max_requests:
+            return {'message': f'At most {max_requests} requests per batch'}, 400
+        # Admission took one token for the batch; it costs one per request
+        rejected = charge(len(specs) - 1)
+        if rejected is not None:
+            return rejected
+        return {'responses': run_batch(specs, parallel=bool(payload.get('parallel')))}
+
+
+class EntryResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self, entry_id):
+        # Per-entry generation, read before the query: a copy read just before a
+        # write to this entry commits is stored under a key that's never read again
+        cache_key = f"entry:item:{entry_id}:{cache.generation(f'entry:{entry_id}')}"
+        data = cache.get(cache_key)
+        if data is None:
+            if request.if_none_match:
+                # Check the version first so a matching ETag never loads the content
+                version = db.session.execute(
+                    ENTRY_SCHEMA.select(('version',)).where(entry_table.c.id == entry_id)
+                ).scalar()
+                if version is None:
+                    abort(404)
+                cached = not_modified(f'{entry_id}-{version}')
+                if cached is not None:
+                    return cached
+
+            row = db.session.execute(
+                ENTRY_SCHEMA.select(('version',) + ENTRY_FIELDS).where(entry_table.c.id == entry_id)
+            ).first()
+            if row is None:
+                abort(404)
+            data = {'version': row[0], 'entry': dict(zip(ENTRY_FIELDS, row[1:]))}
+            cache.set(cache_key, data)
+
+        etag = f"{entry_id}-{data['version']}"
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        return data['entry'], 200, {'ETag': quote_etag(etag)}
+
     @jwt_required()
     def put(self, entry_id):
         data = entry_parser.parse_args()
         entry = Entry.query.get_or_404(entry_id)
-        entry.title = data['title']
-        entry.category = data['category']
-        entry.content = data['content']
-        db.session.commit()
+        if not can_modify(entry.user_id):
+            return {'message': "You don't have permission to modify this entry"}, 403
+        fields = {name: data[name] for name in ('title', 'category', 'content')}
+        if not write(update_entry, entry_id, fields):
+            abort(404)
         return {'message': 'Entry updated'}
 
     @jwt_required()
     def delete(self, entry_id):
         entry = Entry.query.get_or_404(entry_id)
-        db.session.delete(entry)
-        db.session.commit()
-        return {'message': 'Entry deleted'}
\ No newline at end of file
+        if not can_modify(entry.user_id):
+            return {'message': "You don't have permission to modify this entry"}, 403
+        if not write(remove_entry, entry_id):
+            abort(404)
+        return {'message': 'Entry deleted'}
+
+
+def register_resources(api):
+    api.representation('application/json')(output_json)
+    api.add_resource(ApiLoginResource, '/api/login')
+    api.add_resource(TokenRefreshResource, '/api/token/refresh')
+    api.add_resource(TokenRevokeResource, '/api/token/revoke')
+    api.add_resource(EntryListResource, '/api/entries')
+    api.add_resource(EntryBulkResource, '/api/entries/bulk')
+    api.add_resource(EntryExportResource, '/api/entries/export')
+    api.add_resource(EntryChangesResource, '/api/entries/changes')
+    api.add_resource(EntryChangeStreamResource, '/api/entries/changes/stream')
+    api.add_resource(EntrySearchResource, '/api/entries/search')
+    api.add_resource(CategoryListResource, '/api/categories')
+    api.add_resource(CacheStatsResource, '/api/cache/stats')
+    api.add_resource(EntryResource, '/api/entries/<int:entry_id>')
+    api.add_resource(BatchResource, '/api/batch')
@@ -0,0 +1,280 @@
+# app/async_api.py
+"""Asyncio-native version of the entry API, served over ASGI:
+
+    uvicorn app.async_api:app
+
+It shares the models, config and JWT settings of the Flask app but talks to
+the database through SQLAlchemy's async engine, so a slow client waiting on
+SQLite doesn't hold a worker thread.
+"""
+import contextlib
+import functools
+
+from flask_jwt_extended import decode_token
+from jwt import ExpiredSignatureError, InvalidTokenError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import undefer
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse as BaseJSONResponse
+from starlette.routing import Route
+from werkzeug.exceptions import NotFound
+
+from . import blocklist, create_app, db, hasher
+from .apis import DEFAULT_PAGE_SIZE, ENTRY_FIELDS, MAX_PAGE_SIZE, issue_tokens, parse_fields
+from .database import apply_sqlite_pragmas
+from .models import Entry, User
+from .serializers import ENTRY_SCHEMA, dumps, entry_table
+
+# Async drivers for the database backends we support
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+ENTRY_REQUIRED_FIELDS = ('title', 'category', 'content', 'user_id')
+
+flask_app = create_app()
+with flask_app.app_context():
+    sync_url = db.engine.url
+engine = create_async_engine(sync_url.set(drivername=ASYNC_DRIVERS[sync_url.get_backend_name()]))
+apply_sqlite_pragmas(engine.sync_engine, flask_app.config['SQLITE_PRAGMAS'])
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+class JSONResponse(BaseJSONResponse):
+    """Encodes with the same (orjson when installed) encoder as the Flask API."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+class FlaskContextMiddleware:
+    """Run every request inside the Flask app context.
+
+    That gives handlers the app's config, cache and JWT settings, and lets the
+    cache invalidation hooks run when an async session commits.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        with flask_app.app_context():
+            await self.app(scope, receive, send)
+
+
+def jwt_required(refresh=False):
+    """Same checks as flask_jwt_extended's ``jwt_required()`` for a Bearer header."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            auth = request.headers.get('Authorization', '')
+            if not auth.startswith('Bearer '):
+                return JSONResponse({'msg': 'Missing Authorization Header'}, 401)
+            try:
+                claims = decode_token(auth[len('Bearer '):])
+            except ExpiredSignatureError:
+                return JSONResponse({'msg': 'Token has expired'}, 401)
+            except InvalidTokenError as e:
+                return JSONResponse({'msg': str(e)}, 422)
+            if refresh and claims.get('type') != 'refresh':
+                return JSONResponse({'msg': 'Only refresh tokens are allowed'}, 422)
+            if not refresh and claims.get('type') != 'access':
+                return JSONResponse({'msg': 'Only non-refresh tokens are allowed'}, 422)
+            # Usually in memory, but a sync or a Bloom filter "maybe" queries the
+            # database, which blocks, so it runs in a thread like password hashing
+            if await run_in_threadpool(blocklist._get_current_object().is_revoked, claims['jti']):
+                return JSONResponse({'msg': 'Token has been revoked'}, 401)
+            request.state.claims = claims
+            return await handler(request)
+        return wrapper
+    return decorator
+
+
+def can_modify(claims, owner_id):
+    return bool(claims.get('is_admin')) or claims.get('user_id') == owner_id
+
+
+def not_found():
+    return JSONResponse({'message': NotFound.description}, 404)
+
+
+def missing_fields(data, required):
+    missing = [name for name in required if data.get(name) in (None, '')]
+    if missing:
+        return JSONResponse({'message': {name: 'Missing required parameter' for name in missing}}, 400)
+    return None
+
+
+def entry_fields(data):
+    """The entry fields of a create/update body, typed like ``entry_parser`` types them.
+
+    Returns ``(fields, None)``, or ``(None, response)`` with a 400 for
+    missing or mistyped fields.
+    """
+    error = missing_fields(data, ENTRY_REQUIRED_FIELDS)
+    if error is not None:
+        return None, error
+    invalid = {name: 'Must be a string' for name in ('title', 'category', 'content')
+               if not isinstance(data[name], str)}
+    user_id = data['user_id']
+    # Numeric strings are accepted, as by the sync API; bool is an int subclass
+    if isinstance(user_id, str):
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            pass
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        invalid['user_id'] = 'Must be an integer'
+    if invalid:
+        return None, JSONResponse({'message': invalid}, 400)
+    return dict({name: data[name] for name in ENTRY_REQUIRED_FIELDS}, user_id=user_id), None
+
+
+async def read_json(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def login(request):
+    data = await read_json(request)
+    async with Session() as session:
+        user = (await session.execute(
+            select(User).filter_by(username=data.get('username'))
+        )).scalar_one_or_none()
+        # Hashing blocks, so it runs on the bounded password pool via a thread
+        verify_user = hasher._get_current_object().verify_user
+        if user is None or not await run_in_threadpool(verify_user, user, data.get('password')):
+            return JSONResponse({'message': 'Invalid username or password'}, 401)
+        await session.commit()  # Persists a rehashed password, if any
+
+    claims = {"is_admin": user.is_admin, "user_id": user.id}
+    return JSONResponse(issue_tokens(user.username, claims))
+
+
+@jwt_required(refresh=True)
+async def refresh_tokens(request):
+    """Swap a refresh token for a new pair, like the Flask app's ``/api/token/refresh``."""
+    claims = request.state.claims
+    async with Session() as session:
+        user = await session.get(User, claims['user_id']) if claims.get('user_id') is not None else None
+    if user is None or user.username != claims[flask_app.config['JWT_IDENTITY_CLAIM']]:
+        return JSONResponse({'message': 'User no longer exists'}, 401)
+    # Rotation: each refresh token works once; revoking writes, so off the event loop
+    if not await run_in_threadpool(blocklist._get_current_object().revoke, claims):
+        return JSONResponse({'message': 'Refresh token has already been used'}, 401)
+    return JSONResponse(issue_tokens(user.username, {'is_admin': user.is_admin, 'user_id': user.id}))
+
+
+@jwt_required()
+async def list_entries(request):
+    params = request.query_params
+    try:
+        limit = max(1, min(int(params.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+        after = int(params.get('after', 0))
+    except ValueError:
+        return JSONResponse({'message': 'limit and after must be integers'}, 400)
+    fields = parse_fields(params.get('fields'))
+    if fields is None:
+        return JSONResponse({'message': 'Unknown field requested'}, 400)
+
+    query = (ENTRY_SCHEMA.select(fields)
+             .where(entry_table.c.id > after)
+             .order_by(entry_table.c.id)
+             .limit(limit + 1))
+    async with Session() as session:
+        rows = (await session.execute(query)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return JSONResponse({
+        'entries': ENTRY_SCHEMA.dicts(fields, rows),
+        'next_after': rows[-1][0] if has_more else None
+    })
+
+
+@jwt_required()
+async def create_entry(request):
+    data, error = entry_fields(await read_json(request))
+    if error is not None:
+        return error
+
+    async with Session() as session:
+        if (data['user_id'] != request.state.claims.get('user_id')
+                and await session.get(User, data['user_id']) is None):
+            return JSONResponse({'message': 'User not found'}, 404)
+        entry = Entry(**data)
+        session.add(entry)
+        await session.commit()
+    return JSONResponse({'message': 'Entry created', 'id': entry.id}, 201)
+
+
+@jwt_required()
+async def get_entry(request):
+    async with Session() as session:
+        row = (await session.execute(
+            ENTRY_SCHEMA.select(ENTRY_FIELDS).where(entry_table.c.id == request.path_params['entry_id'])
+        )).first()
+    if row is None:
+        return not_found()
+    return JSONResponse(dict(zip(ENTRY_FIELDS, row)))
+
+
+@jwt_required()
+async def update_entry(request):
+    data, error = entry_fields(await read_json(request))
+    if error is not None:
+        return error
+
+    async with Session() as session:
+        # Content is deferred; loaded so that setting it unchanged isn't an update
+        entry = await session.get(Entry, request.path_params['entry_id'], options=[undefer(Entry.content)])
+        if entry is None:
+            return not_found()
+        if not can_modify(request.state.claims, entry.user_id):
+            return JSONResponse({'message': "You don't have permission to modify this entry"}, 403)
+        entry.title = data['title']
+        entry.category = data['category']
+        entry.content = data['content']
+        await session.commit()
+    return JSONResponse({'message': 'Entry updated'})
+
+
+@jwt_required()
+async def delete_entry(request):
+    async with Session() as session:
+        entry = await session.get(Entry, request.path_params['entry_id'])
+        if entry is None:
+            return not_found()
+        if not can_modify(request.state.claims, entry.user_id):
+            return JSONResponse({'message': "You don't have permission to modify this entry"}, 403)
+        await session.delete(entry)
+        await session.commit()
+    return JSONResponse({'message': 'Entry deleted'})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/login', login, methods=['POST']),
+        Route('/api/token/refresh', refresh_tokens, methods=['POST']),
+        Route('/api/entries', list_entries, methods=['GET']),
+        Route('/api/entries', create_entry, methods=['POST']),
+        Route('/api/entries/{entry_id:int}', get_entry, methods=['GET']),
+        Route('/api/entries/{entry_id:int}', update_entry, methods=['PUT']),
+        Route('/api/entries/{entry_id:int}', delete_entry, methods=['DELETE']),
+    ],
+    middleware=[Middleware(FlaskContextMiddleware)],
+    lifespan=lifespan,
+)
@@ -0,0 +1,124 @@
+# app/batch.py
+"""Several API calls in one request.
+
+``POST /api/batch`` takes ``{"requests": [{"method": "PUT", "path":
+"/api/entries/7", "body": {...}}, ...]}`` and answers ``{"responses":
+[{"status": 200, "body": {...}}, ...]}`` in the same order. Each
+sub-request is dispatched in-process to the flask-restful resource that
+serves its path, in an app and request context of its own (so with its own
+session), and is authorized by that resource exactly as over HTTP, with the
+batch's ``Authorization`` header. The round trip, admission check, metrics
+and compression are paid once for the whole batch.
+
+With ``"parallel": true``, runs of consecutive GETs are spread over a
+per-process pool of ``BATCH_MAX_WORKERS`` threads. Everything else runs
+one at a time and in order, so a GET after a PUT sees the PUT.
+"""
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, jsonify, request
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+BATCH_PATH = '/api/batch'
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+# Headers of the batch request that every sub-request gets
+FORWARDED_HEADERS = ('Authorization',)
+
+
+def validate_subrequest(spec):
+    """Return an error message for a malformed sub-request, or None."""
+    if not isinstance(spec, dict) or str(spec.get('method', '')).upper() not in BATCH_METHODS:
+        return f"method must be one of {', '.join(BATCH_METHODS)}"
+    path = spec.get('path')
+    if not isinstance(path, str) or not path.startswith('/api/'):
+        return 'path must start with /api/'
+    if path.split('?', 1)[0].rstrip('/') == BATCH_PATH:
+        return "Batches can't be nested"
+    return None
+
+
+def _error(status, message):
+    response = jsonify(message=message)
+    response.status_code = status
+    return response
+
+
+def _dispatch(app):
+    """Run the current request's view like Flask would, minus the before/after request hooks."""
+    try:
+        return app.make_response(app.dispatch_request())
+    except HTTPException as e:
+        if request.url_rule is None:
+            # No such path (404) or method (405): not a resource's answer
+            return _error(e.code, e.description)
+        return app.make_response(app.handle_user_exception(e))
+    except Exception as e:
+        try:
+            # flask-restful turns it into a 500 (or re-raises in debug mode)
+            return app.make_response(app.handle_user_exception(e))
+        except Exception:
+            app.logger.exception('Batched %s %s failed', request.method, request.path)
+            return _error(500, 'Internal Server Error')
+
+
+def run_subrequest(app, spec, headers, remote_addr):
+    """Dispatch one sub-request. Returns its result and the SQL statements and time it took."""
+    error = validate_subrequest(spec)
+    if error is not None:
+        return {'status': 400, 'body': {'message': error}}, 0, 0.0
+    path, _, query_string = spec['path'].partition('?')
+    builder = EnvironBuilder(path=path, query_string=query_string, method=spec['method'].upper(),
+                             json=spec.get('body'), headers=headers,
+                             environ_base={'REMOTE_ADDR': remote_addr})
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    with app.app_context(), app.request_context(environ):
+        # Counted by the metrics engine hooks, added to the batch's totals
+        g.query_count, g.query_time = 0, 0.0
+        response = _dispatch(app)
+        if response.is_streamed:
+            response.close()
+            response = _error(400, "Streaming endpoints can't be batched")
+        if response.is_json:
+            body = response.get_json(silent=True)
+        else:
+            body = response.get_data(as_text=True) or None
+        return {'status': response.status_code, 'body': body}, g.query_count, g.query_time
+
+
+def run_batch(specs, parallel=False):
+    """Results of ``specs`` in order; consecutive GETs run concurrently if ``parallel``."""
+    app = current_app._get_current_object()
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    run = functools.partial(run_subrequest, app, headers=headers, remote_addr=request.remote_addr)
+    executor = app.extensions['batch_executor']
+
+    outcomes = []
+    index = 0
+    while index < len(specs):
+        end = index + 1
+        if parallel and validate_subrequest(specs[index]) is None and specs[index]['method'].upper() == 'GET':
+            while (end < len(specs) and validate_subrequest(specs[end]) is None
+                   and specs[end]['method'].upper() == 'GET'):
+                end += 1
+        if end - index > 1:
+            outcomes.extend(executor.map(run, specs[index:end]))
+        else:
+            outcomes.append(run(specs[index]))
+        index = end
+
+    if 'query_count' in g:
+        g.query_count += sum(count for _, count, _ in outcomes)
+        g.query_time += sum(seconds for _, _, seconds in outcomes)
+    return [result for result, _, _ in outcomes]
+
+
+def init_batch(app):
+    # Threads are only started on first use, so forking workers after this is fine
+    app.extensions['batch_executor'] = ThreadPoolExecutor(
+        max_workers=app.config['BATCH_MAX_WORKERS'], thread_name_prefix='batch')
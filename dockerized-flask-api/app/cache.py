@@ -0,0 +1,191 @@
+# app/cache.py
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class Cache:
+    """Base class for cache backends. Keeps hit/miss counters."""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': type(self).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0
+        }
+
+    def generation(self, namespace):
+        """Current generation number used to version a group of keys."""
+        return self._get(f'{namespace}:generation') or 0
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def bump(self, namespace):
+        """Invalidate every key built from ``generation(namespace)``."""
+        raise NotImplementedError
+
+
+class NullCache(Cache):
+    """Caching disabled: every lookup is a miss."""
+
+    def _get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def bump(self, namespace):
+        pass
+
+
+class LRUCache(Cache):
+    """In-process cache bounded by size, with per-key expiry."""
+
+    def __init__(self, max_entries=1024, ttl=60):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, namespace):
+        # Kept outside the LRU so a counter can never be evicted; that's at
+        # most one per table plus one per row ever changed
+        return self._generations.get(namespace, 0)
+
+    def _get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def bump(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def stats(self):
+        stats = super().stats()
+        stats['size'] = len(self._data)
+        stats['max_entries'] = self.max_entries
+        return stats
+
+
+class RedisCache(Cache):
+    """Cache shared by every worker and pod, stored in Redis as JSON.
+
+    ``client`` can be anything with redis-py's ``get``/``set``/``delete``/``incr``
+    methods, which makes it easy to swap in a local stand-in.
+    """
+
+    def __init__(self, client, ttl=60, prefix='kb:'):
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, ttl=60):
+        import redis  # Only needed when CACHE_TYPE is 'redis'
+        return cls(redis.Redis.from_url(url), ttl)
+
+    def _get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def bump(self, namespace):
+        self.client.incr(f'{self.prefix}{namespace}:generation')
+
+
+def make_cache(config):
+    """Build the cache backend selected by ``CACHE_TYPE``."""
+    cache_type = config.get('CACHE_TYPE', 'lru')
+    ttl = config.get('CACHE_TTL', 60)
+    if cache_type == 'lru':
+        return LRUCache(config.get('CACHE_MAX_ENTRIES', 1024), ttl)
+    if cache_type == 'redis':
+        return RedisCache.from_url(config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'), ttl)
+    if cache_type == 'null':
+        return NullCache(ttl)
+    raise ValueError(f'Unknown CACHE_TYPE: {cache_type}')
+
+
+def invalidate_on_commit(cache, model):
+    """Drop cached copies of ``model`` rows once a transaction that changed them commits.
+
+    Single rows are keyed on ``cache.generation('<table>:<id>')`` and anything
+    listing rows on ``cache.generation(<table>)``. Both are bumped rather than
+    the keys deleted, so a copy read before the commit but stored after it is
+    never read either.
+    """
+    namespace = model.__tablename__
+
+    @event.listens_for(Session, 'after_flush')
+    def collect_changes(session, flush_context):
+        changed = session.info.setdefault('cache_invalidations', set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, model):
+                changed.add(obj.id)
+
+    @event.listens_for(Session, 'after_commit')
+    def invalidate(session):
+        changed = session.info.pop('cache_invalidations', None)
+        if not changed:
+            return
+        for obj_id in changed:
+            cache.bump(f'{namespace}:{obj_id}')
+        cache.bump(namespace)
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def discard(session, previous_transaction):
+        session.info.pop('cache_invalidations', None)
@@ -0,0 +1,78 @@
+# app/database.py
+import functools
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Name of the Flask-SQLAlchemy bind used for read-only queries
+READ_BIND = 'read'
+
+
+class RoutingSession(Session):
+    """Send queries from ``read_only`` views to the read engine.
+
+    Everything else, and anything flushed, goes to the primary engine.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_only') and not self._flushing:
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(view):
+    """Mark a view as read-only so its queries can use the read engine."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        current_app.extensions['sqlalchemy'].session.info['read_only'] = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def is_memory_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def init_engine_config(config):
+    """Fill in pool options and the read bind before Flask-SQLAlchemy creates engines."""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    # In-memory SQLite uses a single shared connection, so pools and a
+    # separate read engine don't apply.
+    if is_memory_sqlite(uri):
+        return
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+    options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+    options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    binds.setdefault(READ_BIND, config.get('SQLALCHEMY_READ_DATABASE_URI') or uri)
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def apply_sqlite_pragmas(engine, pragmas, read_only=False):
+    """Run ``PRAGMA`` statements on every new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        if read_only:
+            cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
+
+
+def configure_engines(db, config):
+    """Attach connect-time pragmas to the primary and read engines. Needs an app context."""
+    pragmas = config.get('SQLITE_PRAGMAS', {})
+    apply_sqlite_pragmas(db.engine, pragmas)
+    if READ_BIND in db.engines:
+        apply_sqlite_pragmas(db.engines[READ_BIND], pragmas, read_only=True)
@@ -0,0 +1,121 @@
+# app/migrations.py
+"""Numbered schema migrations for databases created by older versions.
+
+``db.create_all()`` builds new tables with the current schema but never
+changes existing ones. Each migration below runs once per database, in
+order, and is recorded in the ``schema_migrations`` table. Migrations must
+be safe to run on a freshly created database too.
+
+Add a migration by appending ``(number, description, function)`` to
+``MIGRATIONS``; the function gets a SQLAlchemy connection.
+"""
+from datetime import datetime
+
+from sqlalchemy import bindparam, inspect, text
+
+from . import db
+from .models import COMPRESS_MIN_SIZE, Entry, RevokedToken, SNIPPET_LENGTH
+
+
+def add_column(table, name, ddl, backfill=None):
+    def migration(connection):
+        existing = {column['name'] for column in inspect(connection).get_columns(table)}
+        if name not in existing:
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+            if backfill:
+                connection.execute(text(backfill))
+    return migration
+
+
+def create_indexes(*statements):
+    def migration(connection):
+        for statement in statements:
+            connection.execute(text(statement))
+    return migration
+
+
+def backfill_category_counts(connection):
+    connection.execute(text('DELETE FROM category_count'))
+    connection.execute(text(
+        'INSERT INTO category_count (category, count) '
+        'SELECT category, COUNT(*) FROM entry GROUP BY category'
+    ))
+
+
+def compress_entry_content(connection, chunk_size=500):
+    # Rows written before CompressedText; going through its column type
+    # compresses them. Core updates, so versions and the change log are untouched.
+    entry_table = Entry.__table__
+    compress = (entry_table.update()
+                .where(entry_table.c.id == bindparam('entry_id'))
+                .values(content=bindparam('body', type_=entry_table.c.content.type)))
+    after = 0
+    while True:
+        rows = connection.execute(
+            text("SELECT id, content FROM entry WHERE id > :after AND typeof(content) = 'text' "
+                 "AND length(CAST(content AS BLOB)) >= :min_size ORDER BY id LIMIT :limit"),
+            {'after': after, 'min_size': COMPRESS_MIN_SIZE, 'limit': chunk_size}
+        ).all()
+        if not rows:
+            return
+        connection.execute(compress, [{'entry_id': row.id, 'body': row.content} for row in rows])
+        after = rows[-1].id
+
+
+
+def autoincrement_revoked_tokens(connection):
+    # Without AUTOINCREMENT, SQLite reuses the ids of pruned rows and other
+    # workers' incremental blocklist sync skips the new revocation
+    sql = connection.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'revoked_token'"
+    )).scalar()
+    if sql is None or 'AUTOINCREMENT' in sql.upper():
+        return
+    connection.execute(text('ALTER TABLE revoked_token RENAME TO revoked_token_old'))
+    connection.execute(text('DROP INDEX IF EXISTS ix_revoked_token_expires_at'))
+    RevokedToken.__table__.create(connection)
+    connection.execute(text(
+        'INSERT INTO revoked_token (id, jti, token_type, user_id, expires_at) '
+        'SELECT id, jti, token_type, user_id, expires_at FROM revoked_token_old'
+    ))
+    connection.execute(text('DROP TABLE revoked_token_old'))
+
+
+MIGRATIONS = [
+    (1, 'Add entry.version', add_column('entry', 'version', 'INTEGER NOT NULL DEFAULT 1')),
+    (2, 'Add entry.snippet', add_column(
+        'entry', 'snippet', f'VARCHAR({SNIPPET_LENGTH})',
+        backfill=f'UPDATE entry SET snippet = substr(content, 1, {SNIPPET_LENGTH})')),
+    (3, 'Index entry author and category', create_indexes(
+        'CREATE INDEX IF NOT EXISTS ix_entry_user_id ON entry (user_id)',
+        'CREATE INDEX IF NOT EXISTS ix_entry_category ON entry (category)',
+        'CREATE INDEX IF NOT EXISTS ix_entry_category_id ON entry (category, id)')),
+    (4, 'Fill category counts', backfill_category_counts),
+    (5, 'Compress large entry bodies', compress_entry_content),
+    (6, 'Never reuse revoked token ids', autoincrement_revoked_tokens),
+]
+
+
+def migrate():
+    """Apply pending migrations. Returns the descriptions of the ones applied."""
+    applied = []
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_migrations '
+            '(version INTEGER PRIMARY KEY, description VARCHAR(200), applied_at DATETIME)'
+        ))
+        done = set(connection.execute(text('SELECT version FROM schema_migrations')).scalars())
+
+    for version, description, migration in MIGRATIONS:
+        if version in done:
+            continue
+        # One transaction per migration, recorded together with its changes
+        with db.engine.begin() as connection:
+            migration(connection)
+            connection.execute(
+                text('INSERT INTO schema_migrations (version, description, applied_at) '
+                     'VALUES (:version, :description, :applied_at)'),
+                {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+            )
+        applied.append(f'{version}: {description}')
+    return applied
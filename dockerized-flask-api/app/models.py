@@ -1,17 +1,74 @@
 # app/models.py
+import zlib
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import deferred, validates
+from sqlalchemy.types import Text, TypeDecorator
 from werkzeug.security import generate_password_hash, check_password_hash
 from . import db
 
+SNIPPET_LENGTH = 100
+# Entry bodies this many bytes or longer (UTF-8) are stored compressed
+COMPRESS_MIN_SIZE = 1024
+
+
+class CompressedText(TypeDecorator):
+    """Text stored zlib-compressed once it is ``min_size`` bytes or longer.
+
+    A compressed value is stored as a BLOB that starts with a one-byte codec
+    marker. Shorter values, and values that wouldn't get smaller, are stored
+    as plain TEXT, as are rows written before compression, so those read
+    back unchanged. Works for ORM attributes and Core selects alike.
+    """
+    impl = Text
+    cache_ok = True
+
+    ZLIB = b'z'
+    CODECS = {ZLIB: zlib.decompress}
+
+    def __init__(self, min_size=COMPRESS_MIN_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self.min_size = min_size
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        data = value.encode('utf-8')
+        if len(data) < self.min_size:
+            return value
+        packed = self.ZLIB + zlib.compress(data)
+        return packed if len(packed) < len(data) else value
+
+    def process_result_value(self, value, dialect):
+        if not isinstance(value, bytes):
+            return value
+        return self.CODECS[value[:1]](value[1:]).decode('utf-8')
+
+
 class Entry(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
-    category = db.Column(db.String(50), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    category = db.Column(db.String(50), nullable=False, index=True)
+    # Only loaded when used: list and permission checks never read (or inflate) it
+    content = deferred(db.Column(CompressedText, nullable=False))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    # Start of the content, stored at write time so listings never load the body
+    snippet = db.Column(db.String(SNIPPET_LENGTH))
     author = db.relationship('User', backref=db.backref('entries', lazy=True))
 
+    # Bumped by SQLAlchemy on every UPDATE; used for ETags
+    __mapper_args__ = {'version_id_col': version}
+    # Lets "entries in a category" queries page by id without sorting
+    __table_args__ = (db.Index('ix_entry_category_id', 'category', 'id'),)
+
+    @validates('content')
+    def update_snippet(self, key, content):
+        self.snippet = content[:SNIPPET_LENGTH] if content else content
+        return content
+
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -23,4 +80,78 @@ class User(UserMixin, db.Model):
         self.password_hash = generate_password_hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
\ No newline at end of file
+        return check_password_hash(self.password_hash, password)
+
+
+class UserIdentity(UserMixin):
+    """Read-only copy of the User fields needed to authorize a web request.
+
+    Built from the cache by ``load_user`` so a logged-in request doesn't have
+    to query the ``user`` table.
+    """
+
+    def __init__(self, id, username, is_admin):
+        self.id = id
+        self.username = username
+        self.is_admin = is_admin
+
+
+class RevokedToken(db.Model):
+    """A JWT that may no longer be used; kept until it would have expired anyway."""
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    token_type = db.Column(db.String(10), nullable=False)
+    user_id = db.Column(db.Integer)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    # AUTOINCREMENT: ids only grow, so other workers' sync (id > last seen) sees every row
+    __table_args__ = {'sqlite_autoincrement': True}
+
+
+class EntryChange(db.Model):
+    """One create, update or delete of an entry, numbered in commit order."""
+    seq = db.Column(db.Integer, primary_key=True)
+    entry_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(6), nullable=False)  # 'create', 'update' or 'delete'
+    version = db.Column(db.Integer, nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    # AUTOINCREMENT: a sequence number is never reused, even after pruning
+    __table_args__ = {'sqlite_autoincrement': True}
+
+
+class CategoryCount(db.Model):
+    """Number of entries per category, kept up to date on every write."""
+    category = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+def _change_category_count(connection, category, delta):
+    connection.execute(
+        text('INSERT INTO category_count (category, count) VALUES (:category, :delta) '
+             'ON CONFLICT (category) DO UPDATE SET count = count + :delta'),
+        {'category': category, 'delta': delta}
+    )
+    if delta < 0:
+        # Only a decrement can empty a category, and only this one
+        connection.execute(text('DELETE FROM category_count WHERE category = :category AND count <= 0'),
+                           {'category': category})
+
+
+@event.listens_for(Entry, 'after_insert')
+def _count_inserted(mapper, connection, entry):
+    _change_category_count(connection, entry.category, 1)
+
+
+@event.listens_for(Entry, 'after_update')
+def _count_updated(mapper, connection, entry):
+    history = inspect(entry).attrs.category.history
+    if history.has_changes():
+        for old in history.deleted:
+            _change_category_count(connection, old, -1)
+        _change_category_count(connection, entry.category, 1)
+
+
+@event.listens_for(Entry, 'after_delete')
+def _count_deleted(mapper, connection, entry):
+    _change_category_count(connection, entry.category, -1)
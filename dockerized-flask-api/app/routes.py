@@ -1,15 +1,49 @@
 # app/routes.py
-from flask import render_template, request, redirect, url_for, flash
+from flask import abort, render_template, request, redirect, url_for, flash
 from flask_login import login_user, login_required, logout_user, current_user
-from . import app, db
+from sqlalchemy.orm import undefer
+from . import db, cache, hasher
 from .models import User, Entry
+from .database import read_only
+from .serializers import ENTRY_SCHEMA, entry_table
+from .writes import insert_entry, remove_entry, update_entry, write
 
-@app.route('/')
+INDEX_PAGE_SIZE = 20
+INDEX_FIELDS = ('id', 'version', 'title', 'category', 'snippet')
+
+@read_only
 def index():
-    entries = Entry.query.order_by(Entry.id.desc()).all()
-    return render_template('index.html', entries=entries)
+    before = request.args.get('before', type=int)
+    cache_key = f"entry:index:{cache.generation('entry')}:{before}"
+    page = cache.get(cache_key)
+    if page is None:
+        # Newest first, one page at a time, without touching Entry.content
+        query = ENTRY_SCHEMA.select(INDEX_FIELDS)
+        if before is not None:
+            query = query.where(entry_table.c.id < before)
+        rows = db.session.execute(
+            query.order_by(entry_table.c.id.desc()).limit(INDEX_PAGE_SIZE + 1)
+        ).all()
+        page = {
+            'entries': ENTRY_SCHEMA.dicts(INDEX_FIELDS, rows[:INDEX_PAGE_SIZE]),
+            'next_before': rows[INDEX_PAGE_SIZE - 1][0] if len(rows) > INDEX_PAGE_SIZE else None
+        }
+        cache.set(cache_key, page)
+
+    fragments = [render_entry_fragment(entry) for entry in page['entries']]
+    return render_template('index.html', fragments=fragments,
+                           next_before=page['next_before'], is_first_page=before is None)
+
+
+def render_entry_fragment(entry):
+    """Render one homepage list item, cached until the entry's version changes."""
+    key = f"entry:{entry['id']}:html:{entry['version']}"
+    html = cache.get(key)
+    if html is None:
+        html = render_template('_entry.html', entry=entry)
+        cache.set(key, html)
+    return html
 
-@app.route('/add', methods=['GET', 'POST'])
 @login_required
 def add_entry():
     if request.method == 'POST':
@@ -17,63 +51,59 @@ def add_entry():
         entry_category = request.form['category']
         entry_content = request.form['content']
 
-        new_entry = Entry(
-            title=entry_title,
-            category=entry_category,
-            content=entry_content,
-            user_id=current_user.id
-        )
-        db.session.add(new_entry)
-        db.session.commit()
+        write(insert_entry, {
+            'title': entry_title,
+            'category': entry_category,
+            'content': entry_content,
+            'user_id': current_user.id,
+        })
         flash("Entry added successfully!", "success")
         return redirect(url_for('index'))
 
     return render_template('add_entry.html')
 
 
-@app.route('/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_entry(id):
-    entry = Entry.query.get_or_404(id)
+    # The form shows the content, so load it with the row rather than lazily
+    entry = Entry.query.options(undefer(Entry.content)).get_or_404(id)
 
-    if entry.author != current_user and not current_user.is_admin:
+    if entry.user_id != current_user.id and not current_user.is_admin:
         flash("You don't have permission to edit this entry.", "danger")
         return redirect(url_for('index'))
 
     if request.method == 'POST':
-        entry.title = request.form['title']
-        entry.category = request.form['category']
-        entry.content = request.form['content']
-        db.session.commit()
+        fields = {name: request.form[name] for name in ('title', 'category', 'content')}
+        if not write(update_entry, id, fields):
+            abort(404)
         flash("Entry updated successfully!", "success")
         return redirect(url_for('index'))
 
     return render_template('edit_entry.html', entry=entry)
 
 
-@app.route('/delete/<int:id>')
 @login_required
 def delete_entry(id):
     entry = Entry.query.get_or_404(id)
 
-    if entry.author != current_user and not current_user.is_admin:
+    if entry.user_id != current_user.id and not current_user.is_admin:
         flash("You don't have permission to delete this entry.", "danger")
         return redirect(url_for('index'))
 
-    db.session.delete(entry)
-    db.session.commit()
+    if not write(remove_entry, id):
+        abort(404)
     flash("Entry deleted successfully!", "success")
     return redirect(url_for('index'))
 
 
-@app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         user = User.query.filter_by(username=username).first()
 
-        if user and user.check_password(password):
+        if user and hasher.verify_user(user, password):
+            db.session.commit()  # Persists a rehashed password, if any
             login_user(user)
             flash("Logged in successfully!", "success")
             return redirect(url_for('index'))
@@ -83,7 +113,6 @@ def login():
     return render_template('login.html')
 
 
-@app.route('/logout')
 @login_required
 def logout():
     logout_user()
@@ -91,7 +120,6 @@ def logout():
     return redirect(url_for('index'))
 
 
-@app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -103,10 +131,26 @@ def register():
             return redirect(url_for('register'))
 
         new_user = User(username=username)
-        new_user.set_password(password)
+        new_user.password_hash = hasher.hash(password)
         db.session.add(new_user)
         db.session.commit()
         flash("Registration successful! Please log in.", "success")
         return redirect(url_for('login'))
 
-    return render_template('register.html')
\ No newline at end of file
+    return render_template('register.html')
+
+
+def healthz():
+    """Readiness probe. Doesn't touch the database, so it answers as soon as a worker is up."""
+    return 'ok'
+
+
+def register_routes(app):
+    app.add_url_rule('/', 'index', index)
+    app.add_url_rule('/add', 'add_entry', add_entry, methods=['GET', 'POST'])
+    app.add_url_rule('/edit/<int:id>', 'edit_entry', edit_entry, methods=['GET', 'POST'])
+    app.add_url_rule('/delete/<int:id>', 'delete_entry', delete_entry)
+    app.add_url_rule('/login', 'login', login, methods=['GET', 'POST'])
+    app.add_url_rule('/logout', 'logout', logout)
+    app.add_url_rule('/register', 'register', register, methods=['GET', 'POST'])
+    app.add_url_rule('/healthz', 'healthz', healthz)
@@ -0,0 +1,80 @@
+# app/search.py
+from sqlalchemy import event, inspect, select, text
+from . import db
+from .models import Entry
+from .serializers import entry_table
+
+
+# Entries are mirrored into an FTS5 table (rowid = Entry.id) so search is an
+# indexed lookup instead of a scan. ORM events keep it in sync on every
+# insert/update/delete, whichever route or resource made the change.
+SEARCH_TABLE = 'entry_fts'
+
+
+def init_search_index():
+    """Create the FTS5 table and backfill it from existing entries."""
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': SEARCH_TABLE}
+    ).first()
+    if exists:
+        return
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(title, category, content)"
+    ))
+    # Read through the mapped column, so compressed bodies are indexed as text
+    rows = db.session.execute(select(
+        entry_table.c.id, entry_table.c.title, entry_table.c.category, entry_table.c.content
+    )).mappings().all()
+    if rows:
+        db.session.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, category, content) "
+            "VALUES (:id, :title, :category, :content)"
+        ), [dict(row) for row in rows])
+    db.session.commit()
+
+
+def _index_entry(connection, entry):
+    if 'content' in inspect(entry).unloaded:
+        # Deferred and never set, so the indexed content is still current
+        connection.execute(
+            text(f"UPDATE {SEARCH_TABLE} SET title = :title, category = :category WHERE rowid = :id"),
+            {'id': entry.id, 'title': entry.title, 'category': entry.category}
+        )
+        return
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"), {'id': entry.id})
+    connection.execute(
+        text(f"INSERT INTO {SEARCH_TABLE} (rowid, title, category, content) "
+             "VALUES (:id, :title, :category, :content)"),
+        {'id': entry.id, 'title': entry.title, 'category': entry.category, 'content': entry.content}
+    )
+
+
+@event.listens_for(Entry, 'after_insert')
+@event.listens_for(Entry, 'after_update')
+def _entry_saved(mapper, connection, entry):
+    _index_entry(connection, entry)
+
+
+@event.listens_for(Entry, 'after_delete')
+def _entry_deleted(mapper, connection, entry):
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"), {'id': entry.id})
+
+
+def build_match_query(q):
+    """Quote every word so user input can't break the FTS5 query syntax."""
+    terms = ['"%s"' % term.replace('"', '""') for term in q.split()]
+    return ' '.join(terms)
+
+
+def search_entries(q, limit, offset):
+    """Return (rows, has_more) for entries matching ``q``, best match first."""
+    rows = db.session.execute(
+        text(f"SELECT entry.id, entry.title, entry.category, "
+             f"snippet({SEARCH_TABLE}, 2, '[', ']', '...', 12) AS snippet "
+             f"FROM {SEARCH_TABLE} JOIN entry ON entry.id = {SEARCH_TABLE}.rowid "
+             f"WHERE {SEARCH_TABLE} MATCH :match "
+             f"ORDER BY {SEARCH_TABLE}.rank LIMIT :limit OFFSET :offset"),
+        {'match': build_match_query(q), 'limit': limit + 1, 'offset': offset}
+    ).all()
+    return rows[:limit], len(rows) > limit
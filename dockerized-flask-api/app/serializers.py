@@ -0,0 +1,81 @@
+# app/serializers.py
+"""Schema-driven serialization for read endpoints.
+
+Read paths SELECT plain table columns with SQLAlchemy Core ``select()`` and
+turn the row tuples into dicts here, so no ORM objects (identity map,
+attribute instrumentation) are built just to be copied into JSON. JSON is
+encoded with ``orjson`` when it is installed.
+"""
+import json
+
+from flask import make_response
+from sqlalchemy import select
+
+from .models import Entry, User
+
+try:
+    import orjson
+except ImportError:  # Optional: pip install orjson
+    orjson = None
+
+
+class Schema:
+    """Named columns of ``table`` a resource can return.
+
+    ``joins`` maps a field name to the ``(table, onclause)`` it needs; the
+    join is only added when that field is requested.
+    """
+
+    def __init__(self, table, columns, joins=None):
+        self.table = table
+        self.columns = columns
+        self.joins = joins or {}
+
+    def select(self, fields, from_clause=None):
+        """Core ``select()`` returning one tuple per row, in ``fields`` order.
+
+        ``from_clause`` replaces the schema's table, e.g. with a join to it.
+        """
+        from_clause = self.table if from_clause is None else from_clause
+        for name in fields:
+            if name in self.joins:
+                from_clause = from_clause.outerjoin(*self.joins[name])
+        return select(*(self.columns[name] for name in fields)).select_from(from_clause)
+
+    @staticmethod
+    def dicts(fields, rows):
+        return [dict(zip(fields, row)) for row in rows]
+
+
+entry_table = Entry.__table__
+user_table = User.__table__
+
+ENTRY_SCHEMA = Schema(
+    entry_table,
+    {
+        'id': entry_table.c.id,
+        'version': entry_table.c.version,
+        'title': entry_table.c.title,
+        'category': entry_table.c.category,
+        'content': entry_table.c.content,
+        'snippet': entry_table.c.snippet,
+        # The author's username, joined in the same query
+        'author': user_table.c.username,
+    },
+    joins={'author': (user_table, entry_table.c.user_id == user_table.c.id)},
+)
+
+
+def dumps(data):
+    """Encode ``data`` as compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def output_json(data, code, headers=None):
+    """flask-restful representation for ``application/json`` that uses ``dumps``."""
+    response = make_response(dumps(data), code)
+    response.headers.extend(headers or {})
+    response.mimetype = 'application/json'
+    return response
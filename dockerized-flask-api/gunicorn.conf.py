@@ -0,0 +1,38 @@
+# Gunicorn settings for production, all overridable from the environment:
+#   gunicorn -c gunicorn.conf.py "main:app"
+import os
+import tempfile
+
+
+def _available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS/Windows
+        return os.cpu_count() or 1
+
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', _available_cpus()))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+# Import the app once in the master and fork workers from it, so a new or
+# recycled worker is serving in milliseconds. Safe because create_app()
+# doesn't open database connections or start threads.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Recycle workers now and then to cap slow memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+
+# Workers write their metrics to files in this directory so /metrics on any
+# worker reports the whole server. Set before the app (and prometheus_client)
+# is imported.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='prometheus-'))
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,5 +1,11 @@
 # main.py
-from app import app
+from app import create_app, init_db
+
+# Picks the config preset from APP_CONFIG (defaults to development)
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Development convenience: `flask --app main init-db` does this for deployments
+    with app.app_context():
+        init_db()
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,197 @@
+"""Admission control: shed load early instead of queueing it.
+
+Every request to an API resource or web page passes two checks before it
+runs:
+
+- a token bucket per identity (the JWT identity, else the logged-in session
+  user, else the client address) allows ``ADMISSION_RATE`` requests per
+  second with bursts of ``ADMISSION_BURST``; over that the client gets
+  ``429 Too Many Requests``;
+- a per-process limit on requests in flight, adjusted from observed latency
+  (additive increase while requests finish within
+  ``ADMISSION_LATENCY_TARGET``, multiplicative decrease when they don't);
+  over the limit the client gets ``503 Service Unavailable``.
+
+Both answers carry ``Retry-After`` and are sent without touching the
+database, so requests that are admitted keep a bounded latency instead of
+everyone waiting on SQLite locks and password hashing.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, jsonify, request, session
+from flask_jwt_extended import decode_token
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+# Never limited: health checks, metrics scrapes and static files
+EXEMPT_ENDPOINTS = {'healthz', 'metrics', 'static'}
+
+
+class RateLimited(TooManyRequests):
+    description = 'Too many requests, please slow down.'
+
+
+class Overloaded(ServiceUnavailable):
+    description = 'The server is busy, please try again shortly.'
+
+
+class RateLimiter:
+    """Token buckets per key, at most ``max_keys`` of them (least recently used go first)."""
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def acquire(self, key, cost=1):
+        """Take ``cost`` tokens for ``key``. Returns 0 if allowed, else seconds until there are enough."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+                bucket = [self.burst, now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            self._buckets[key] = bucket
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return 0
+            bucket[0] = tokens
+            return (cost - tokens) / self.rate
+
+
+class ConcurrencyLimiter:
+    """Caps requests in flight, adapting the cap to their latency (AIMD).
+
+    Each request that finishes within ``target`` seconds while the limit is
+    at least half used raises the limit by ``1 / limit`` (about one per
+    round of requests). A slower one multiplies it by ``backoff``, unless it
+    was admitted before the previous decrease: it then says nothing about
+    the current limit, and one slow burst only counts once.
+    """
+
+    def __init__(self, initial=16, min_limit=1, max_limit=64, target=0.5, backoff=0.5):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target = target
+        self.backoff = backoff
+        self.in_flight = 0
+        self._last_decrease = float('-inf')
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, started=None):
+        """Free a slot; ``started`` (``time.perf_counter()`` at admission) adjusts the limit."""
+        now = time.perf_counter()
+        with self._lock:
+            self.in_flight -= 1
+            if started is None:
+                return
+            if now - started > self.target:
+                if started >= self._last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            elif self.in_flight * 2 >= self.limit:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+def client_identity():
+    """Who the request counts against: JWT identity, session user or client address."""
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        try:
+            claims = decode_token(auth[7:])
+            return f"jwt:{claims[current_app.config['JWT_IDENTITY_CLAIM']]}"
+        except Exception:
+            pass  # Invalid or expired: the resource answers 401, count the address
+    user_id = session.get('_user_id')
+    if user_id is not None:
+        return f'user:{user_id}'
+    return f'addr:{request.remote_addr}'
+
+
+def _reject(error, retry_after):
+    # Answered here rather than raised so that flask-restful doesn't log a
+    # traceback for every shed request
+    if request.path.startswith('/api/'):
+        response = jsonify(message=error.description)
+        response.status_code = error.code
+    else:
+        response = error.get_response()
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def admit():
+    if request.endpoint in EXEMPT_ENDPOINTS:
+        return None
+    limits = current_app.extensions['admission']
+    rate_limiter = limits['rate']
+    if rate_limiter is not None:
+        wait = rate_limiter.acquire(client_identity())
+        if wait:
+            return _reject(RateLimited(), wait)
+    if not limits['concurrency'].try_acquire():
+        return _reject(Overloaded(), 1)
+    g.admitted_at = time.perf_counter()
+    return None
+
+
+def charge(cost):
+    """Take ``cost`` more tokens for a request that does the work of several.
+
+    Returns a 429 response if the client doesn't have them, else None.
+    """
+    limits = current_app.extensions.get('admission')
+    if limits is None or limits['rate'] is None or cost <= 0:
+        return None
+    wait = limits['rate'].acquire(client_identity(), cost)
+    if wait:
+        return _reject(RateLimited(), wait)
+    return None
+
+
+def _note_streamed(response):
+    # A streamed body's duration depends on the client, not on our load
+    if response.is_streamed and 'admitted_at' in g:
+        g.admission_streamed = True
+    return response
+
+
+def _release(exc):
+    if 'admitted_at' not in g:
+        return
+    started = g.pop('admitted_at')
+    current_app.extensions['admission']['concurrency'].release(None if g.get('admission_streamed') else started)
+
+
+def init_admission(app):
+    config = app.config
+    if not config['ADMISSION_ENABLED']:
+        return
+    rate = config['ADMISSION_RATE']
+    app.extensions['admission'] = {
+        'rate': RateLimiter(rate, config['ADMISSION_BURST'], config['ADMISSION_MAX_IDENTITIES']) if rate else None,
+        'concurrency': ConcurrencyLimiter(
+            initial=config['ADMISSION_INITIAL_LIMIT'],
+            min_limit=config['ADMISSION_MIN_LIMIT'],
+            max_limit=config['ADMISSION_MAX_LIMIT'],
+            target=config['ADMISSION_LATENCY_TARGET'],
+        ),
+    }
+    app.before_request(admit)
+    app.after_request(_note_streamed)
+    app.teardown_request(_release)
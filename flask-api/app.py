@@ -1,68 +1,154 @@
-from datetime import timedelta
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from flask_sqlalchemy import SQLAlchemy
+import hashlib
+import time
+import click
+from flask import (
+    Flask, Response, abort, current_app, render_template, request, redirect,
+    url_for, flash, jsonify, stream_with_context
+)
+from flask.cli import with_appcontext
 from flask_login import (
-    LoginManager, UserMixin, login_user,
+    LoginManager, login_user,
     login_required, logout_user, current_user
 )
 from flask_restful import Api, Resource, reqparse
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import undefer
+from werkzeug.http import quote_etag
+from werkzeug.local import LocalProxy
+from admission import charge, init_admission
+from assets import init_assets
+from batch import init_batch, run_batch
+from cache import make_cache, invalidate_on_commit
+from changes import change_cursor, change_stream_response, fetch_changes, init_changes
+from compression import init_compression
+from config import load_config
+from database import configure_engines, init_engine_config, read_only
+from metrics import init_metrics
+from migrations import migrate
+from models import db, CategoryCount, Entry, User, UserIdentity
+from passwords import PasswordHasher
+from serializers import ENTRY_SCHEMA, dumps, entry_table, output_json
+from tokens import Blocklist
+from writes import init_writes, insert_entry, remove_entry, update_entry, write
 from datetime import datetime
 from flask_jwt_extended import (
-    JWTManager, create_access_token,
-    jwt_required, get_jwt_identity
+    JWTManager, create_access_token, create_refresh_token,
+    jwt_required, get_jwt, get_jwt_identity
 )
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///knowledge_base.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-app.config['JWT_SECRET_KEY'] = 'your-jwt-secret-key-here'
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=5)  # 👈 Set expiry here
-jwt = JWTManager(app)
-
-db = SQLAlchemy(app)
+# Extensions are bound to an app in create_app()
+jwt = JWTManager()
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 
-api = Api(app)
+# The cache, password hasher and token blocklist are built from each app's config
+cache = LocalProxy(lambda: current_app.extensions['cache'])
+hasher = LocalProxy(lambda: current_app.extensions['password_hasher'])
+blocklist = LocalProxy(lambda: current_app.extensions['token_blocklist'])
+
+invalidate_on_commit(cache, Entry)
+invalidate_on_commit(cache, User)
+
 
-@app.context_processor
 def inject_year():
     return {'current_year': datetime.now().year}
 
 
+@login_manager.user_loader
+def load_user(user_id):
+    data = cache.get(f'user:{user_id}')
+    if data is None:
+        user = db.session.get(User, int(user_id))
+        if user is None:
+            return None
+        data = {'id': user.id, 'username': user.username, 'is_admin': bool(user.is_admin)}
+        cache.set(f'user:{user_id}', data)
+    return UserIdentity(**data)
+
+
+@jwt.token_in_blocklist_loader
+def token_revoked(jwt_header, jwt_payload):
+    return blocklist.is_revoked(jwt_payload['jti'])
+
+
 # ----------------------------
-# Models
+# Full-text Search
 # ----------------------------
 
-class Entry(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(100), nullable=False)
-    category = db.Column(db.String(50), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    author = db.relationship('User', backref=db.backref('entries', lazy=True))
+# Entries are mirrored into an FTS5 table (rowid = Entry.id) so search is an
+# indexed lookup instead of a scan. ORM events keep it in sync on every
+# insert/update/delete, whichever route or resource made the change.
+SEARCH_TABLE = 'entry_fts'
+
+
+def init_search_index():
+    """Create the FTS5 table and backfill it from existing entries."""
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': SEARCH_TABLE}
+    ).first()
+    if exists:
+        return
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(title, category, content)"
+    ))
+    # Read through the mapped column, so compressed bodies are indexed as text
+    rows = db.session.execute(select(
+        entry_table.c.id, entry_table.c.title, entry_table.c.category, entry_table.c.content
+    )).mappings().all()
+    if rows:
+        db.session.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, category, content) "
+            "VALUES (:id, :title, :category, :content)"
+        ), [dict(row) for row in rows])
+    db.session.commit()
 
 
-class User(UserMixin, db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
-    is_admin = db.Column(db.Boolean, default=False)
+def _index_entry(connection, entry):
+    if 'content' in inspect(entry).unloaded:
+        # Deferred and never set, so the indexed content is still current
+        connection.execute(
+            text(f"UPDATE {SEARCH_TABLE} SET title = :title, category = :category WHERE rowid = :id"),
+            {'id': entry.id, 'title': entry.title, 'category': entry.category}
+        )
+        return
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"), {'id': entry.id})
+    connection.execute(
+        text(f"INSERT INTO {SEARCH_TABLE} (rowid, title, category, content) "
+             "VALUES (:id, :title, :category, :content)"),
+        {'id': entry.id, 'title': entry.title, 'category': entry.category, 'content': entry.content}
+    )
 
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
 
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+@event.listens_for(Entry, 'after_insert')
+@event.listens_for(Entry, 'after_update')
+def _entry_saved(mapper, connection, entry):
+    _index_entry(connection, entry)
 
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+@event.listens_for(Entry, 'after_delete')
+def _entry_deleted(mapper, connection, entry):
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"), {'id': entry.id})
+
+
+def build_match_query(q):
+    """Quote every word so user input can't break the FTS5 query syntax."""
+    terms = ['"%s"' % term.replace('"', '""') for term in q.split()]
+    return ' '.join(terms)
+
+
+def search_entries(q, limit, offset):
+    """Return (rows, has_more) for entries matching ``q``, best match first."""
+    rows = db.session.execute(
+        text(f"SELECT entry.id, entry.title, entry.category, "
+             f"snippet({SEARCH_TABLE}, 2, '[', ']', '...', 12) AS snippet "
+             f"FROM {SEARCH_TABLE} JOIN entry ON entry.id = {SEARCH_TABLE}.rowid "
+             f"WHERE {SEARCH_TABLE} MATCH :match "
+             f"ORDER BY {SEARCH_TABLE}.rank LIMIT :limit OFFSET :offset"),
+        {'match': build_match_query(q), 'limit': limit + 1, 'offset': offset}
+    ).all()
+    return rows[:limit], len(rows) > limit
 
 
 # ----------------------------
@@ -75,6 +161,137 @@ entry_parser.add_argument('category', required=True)
 entry_parser.add_argument('content', required=True)
 entry_parser.add_argument('user_id', type=int, required=True)
 
+# Parser for list pagination (keyset on Entry.id) and field projection
+# ``author`` is the author's username, joined in the same query
+ENTRY_FIELDS = ('id', 'title', 'category', 'content', 'author')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+list_parser = reqparse.RequestParser()
+list_parser.add_argument('limit', type=int, location='args', default=DEFAULT_PAGE_SIZE)
+list_parser.add_argument('after', type=int, location='args', default=0)
+list_parser.add_argument('fields', location='args')
+list_parser.add_argument('category', location='args')
+list_parser.add_argument('user_id', type=int, location='args')
+
+# Parser for the change feed; without ``since`` it starts at the newest change
+changes_parser = reqparse.RequestParser()
+changes_parser.add_argument('since', type=int, location='args')
+changes_parser.add_argument('limit', type=int, location='args', default=DEFAULT_PAGE_SIZE)
+changes_parser.add_argument('fields', location='args')
+
+search_parser = reqparse.RequestParser()
+search_parser.add_argument('q', location='args', required=True)
+search_parser.add_argument('limit', type=int, location='args', default=DEFAULT_PAGE_SIZE)
+search_parser.add_argument('offset', type=int, location='args', default=0)
+
+
+def parse_fields(fields):
+    """Turn a ``fields=title,category`` value into a tuple of column names."""
+    if not fields:
+        return ENTRY_FIELDS
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in ENTRY_FIELDS]
+    if unknown:
+        return None
+    # The id is always returned because it is the pagination cursor
+    return ('id',) + tuple(name for name in ENTRY_FIELDS if name in names and name != 'id')
+
+
+# Streaming export (one JSON document per line)
+NDJSON_MIMETYPE = 'application/x-ndjson'
+EXPORT_CHUNK_SIZE = 500
+
+
+def stream_entries(fields):
+    """Yield entries as NDJSON lines, fetching rows from the DB in chunks."""
+    query = (ENTRY_SCHEMA.select(fields)
+             .order_by(entry_table.c.id)
+             .execution_options(stream_results=True, yield_per=EXPORT_CHUNK_SIZE))
+    for row in db.session.execute(query):
+        yield dumps(dict(zip(fields, row))) + b'\n'
+
+
+def export_response(fields):
+    return Response(stream_with_context(stream_entries(fields)), mimetype=NDJSON_MIMETYPE)
+
+
+# Bulk create/update/delete
+MAX_BULK_OPERATIONS = 1000
+BULK_MODES = ('atomic', 'best_effort')
+BULK_REQUIRED_FIELDS = {
+    'create': ('title', 'category', 'content', 'user_id'),
+    'update': ('id', 'title', 'category', 'content'),
+    'delete': ('id',),
+}
+
+
+def validate_bulk_operation(op):
+    """Return an error message for a malformed bulk operation, or None."""
+    if not isinstance(op, dict) or not isinstance(op.get('op'), str) or op['op'] not in BULK_REQUIRED_FIELDS:
+        return "op must be one of create, update, delete"
+    missing = [name for name in BULK_REQUIRED_FIELDS[op['op']] if op.get(name) in (None, '')]
+    if missing:
+        return f"Missing required fields: {', '.join(missing)}"
+    for name in BULK_REQUIRED_FIELDS[op['op']]:
+        if name in ('id', 'user_id'):
+            # bool is an int subclass, but true isn't an id
+            if not isinstance(op[name], int) or isinstance(op[name], bool):
+                return f"{name} must be an integer"
+        elif not isinstance(op[name], str):
+            return f"{name} must be a string"
+    return None
+
+
+def bulk_result(index, status, **extra):
+    return dict(index=index, status=status, **extra)
+
+
+def can_modify(owner_id):
+    """Owners and admins may change an entry; decided from the JWT claims alone."""
+    claims = get_jwt()
+    return bool(claims.get('is_admin')) or claims.get('user_id') == owner_id
+
+
+# Conditional GET support
+def not_modified(etag):
+    """Return a bodiless 304 response if the client already has ``etag``.
+
+    Compressed responses carry a weak version of the same ETag, so the
+    comparison ignores weakness.
+    """
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers={'ETag': quote_etag(etag)})
+    return None
+
+
+def entry_page_versions(after, limit, category=None, user_id=None):
+    """``id.version`` of a list page's rows (and the next one), read from the index only."""
+    conditions = ['id > :after']
+    if category is not None:
+        conditions.append('category = :category')
+    if user_id is not None:
+        conditions.append('user_id = :user_id')
+    return db.session.execute(
+        text("SELECT group_concat(id || '.' || version) FROM "
+             f"(SELECT id, version FROM entry WHERE {' AND '.join(conditions)} "
+             "ORDER BY id LIMIT :limit)"),
+        {'after': after, 'limit': limit + 1, 'category': category, 'user_id': user_id}
+    ).scalar() or ''
+
+
+def entry_page_etag(after, limit, fields, category, user_id, versions):
+    """Fingerprint a list page from the ids and versions of its rows only."""
+    key = f"{after}:{limit}:{','.join(fields)}:{category}:{user_id}:{versions}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def issue_tokens(identity, claims):
+    return {
+        'access_token': create_access_token(identity=identity, additional_claims=claims),
+        'refresh_token': create_refresh_token(identity=identity, additional_claims=claims),
+    }
+
 
 class ApiLoginResource(Resource):
     def post(self):
@@ -83,84 +300,412 @@ class ApiLoginResource(Resource):
 
         user = User.query.filter_by(username=username).first()
 
-        if user and user.check_password(password):
-            claims = {"is_admin": user.is_admin}
-            access_token = create_access_token(identity=user.username, additional_claims=claims)
-            return {'access_token': access_token}, 200
+        if user and hasher.verify_user(user, password):
+            db.session.commit()  # Persists a rehashed password, if any
+            claims = {"is_admin": user.is_admin, "user_id": user.id}
+            return issue_tokens(user.username, claims), 200
 
         return {'message': 'Invalid username or password'}, 401
 
 
+class TokenRefreshResource(Resource):
+    """Swap a refresh token for a new access and refresh token, without a password check."""
+
+    @jwt_required(refresh=True)
+    def post(self):
+        claims = get_jwt()
+        # A primary-key lookup (no password hash), so deleted users can't
+        # keep refreshing and admin rights follow the user row
+        user = db.session.get(User, claims['user_id']) if claims.get('user_id') is not None else None
+        if user is None or user.username != get_jwt_identity():
+            return {'message': 'User no longer exists'}, 401
+        # Rotation: each refresh token works once, even when requests race
+        if not blocklist.revoke(claims):
+            return {'message': 'Refresh token has already been used'}, 401
+        return issue_tokens(user.username, {'is_admin': user.is_admin, 'user_id': user.id}), 200
+
+
+class TokenRevokeResource(Resource):
+    """Log out: revoke the access or refresh token sent with the request."""
+
+    @jwt_required(verify_type=False)
+    def post(self):
+        blocklist.revoke(get_jwt())
+        return {'message': 'Token revoked'}, 200
+
+
 class EntryListResource(Resource):
     @jwt_required()
+    @read_only
     def get(self):
-        entries = Entry.query.all()
-        return [{
-            'id': e.id,
-            'title': e.title,
-            'category': e.category,
-            'content': e.content
-        } for e in entries]
+        args = list_parser.parse_args()
+        limit = max(1, min(args['limit'], MAX_PAGE_SIZE))
+        fields = parse_fields(args['fields'])
+        if fields is None:
+            return {'message': 'Unknown field requested'}, 400
+
+        if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+            return export_response(fields)
+
+        category, user_id = args['category'], args['user_id']
+        cache_key = (f"entry:list:{cache.generation('entry')}:"
+                     f"{args['after']}:{limit}:{','.join(fields)}:{category}:{user_id}")
+        page = cache.get(cache_key)
+        if page is None:
+            if request.if_none_match:
+                # Revalidation: an index-only query may spare fetching the rows
+                versions = entry_page_versions(args['after'], limit, category, user_id)
+                cached = not_modified(entry_page_etag(args['after'], limit, fields, category, user_id, versions))
+                if cached is not None:
+                    return cached
+
+            # Only SELECT the requested columns (plus the version, for the
+            # ETag) and fetch one extra row to know whether another page exists.
+            query = ENTRY_SCHEMA.select(fields + ('version',)).where(entry_table.c.id > args['after'])
+            # Served by the (category, id) and user_id indexes
+            if category is not None:
+                query = query.where(entry_table.c.category == category)
+            if user_id is not None:
+                query = query.where(entry_table.c.user_id == user_id)
+            rows = db.session.execute(query.order_by(entry_table.c.id).limit(limit + 1)).all()
+            versions = ','.join(f'{row[0]}.{row[-1]}' for row in rows)
+            etag = entry_page_etag(args['after'], limit, fields, category, user_id, versions)
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            page = {
+                'etag': etag,
+                'body': {
+                    'entries': ENTRY_SCHEMA.dicts(fields, rows),
+                    'next_after': rows[-1][0] if has_more else None
+                }
+            }
+            cache.set(cache_key, page)
+
+        cached = not_modified(page['etag'])
+        if cached is not None:
+            return cached
+        return page['body'], 200, {'ETag': quote_etag(page['etag'])}
 
     @jwt_required()
     def post(self):
         data = entry_parser.parse_args()
-        user = User.query.get(data['user_id'])
-        if not user:
+        # The caller's own id comes from the token, so only look up other users
+        if data['user_id'] != get_jwt().get('user_id') and not db.session.get(User, data['user_id']):
             return {'message': 'User not found'}, 404
 
-        new_entry = Entry(**data)
-        db.session.add(new_entry)
-        db.session.commit()
-        return {'message': 'Entry created', 'id': new_entry.id}, 201
+        entry_id = write(insert_entry, dict(data))
+        return {'message': 'Entry created', 'id': entry_id}, 201
 
 
-class EntryResource(Resource):
+class EntryBulkResource(Resource):
     @jwt_required()
-    def get(self, entry_id):
-        entry = Entry.query.get_or_404(entry_id)
+    def post(self):
+        payload = request.get_json(silent=True) or {}
+        if not isinstance(payload, dict):
+            return {'message': 'Request body must be a JSON object'}, 400
+        operations = payload.get('operations')
+        mode = payload.get('mode', 'atomic')
+        if not isinstance(operations, list) or not operations:
+            return {'message': 'operations must be a non-empty list'}, 400
+        if len(operations) > MAX_BULK_OPERATIONS:
+            return {'message': f'At most {MAX_BULK_OPERATIONS} operations per request'}, 400
+        if mode not in BULK_MODES:
+            return {'message': f"mode must be one of {', '.join(BULK_MODES)}"}, 400
+
+        results = [validate_bulk_operation(op) for op in operations]
+
+        # Resolve every referenced user and entry with one query each
+        user_ids = {op['user_id'] for op, err in zip(operations, results)
+                    if err is None and op['op'] == 'create'}
+        entry_ids = {op['id'] for op, err in zip(operations, results)
+                     if err is None and op['op'] != 'create'}
+        known_users = {row.id for row in
+                       db.session.query(User.id).filter(User.id.in_(user_ids))} if user_ids else set()
+        entry_query = Entry.query.filter(Entry.id.in_(entry_ids))
+        if any(op['op'] == 'update' for op, err in zip(operations, results) if err is None):
+            # So that unchanged content doesn't count as a change
+            entry_query = entry_query.options(undefer(Entry.content))
+        entries = {entry.id: entry for entry in entry_query} if entry_ids else {}
+
+        deleted = set()
+        for index, op in enumerate(operations):
+            if results[index] is not None:
+                continue
+            if op['op'] == 'create':
+                if op['user_id'] not in known_users:
+                    results[index] = 'User not found'
+            elif op['id'] not in entries or op['id'] in deleted:
+                results[index] = 'Entry not found'
+            elif not can_modify(entries[op['id']].user_id):
+                results[index] = 'Permission denied'
+            elif op['op'] == 'delete':
+                deleted.add(op['id'])
+
+        if mode == 'atomic' and any(results):
+            return {'results': [bulk_result(i, 'error', message=err)
+                                for i, err in enumerate(results) if err]}, 400
+
+        applied = []
+        for index, op in enumerate(operations):
+            if results[index] is not None:
+                continue
+            if op['op'] == 'create':
+                entry = Entry(title=op['title'], category=op['category'],
+                              content=op['content'], user_id=op['user_id'])
+                db.session.add(entry)
+                applied.append((index, 'created', entry))
+            elif op['op'] == 'update':
+                entry = entries[op['id']]
+                entry.title = op['title']
+                entry.category = op['category']
+                entry.content = op['content']
+                applied.append((index, 'updated', entry))
+            else:
+                entry = entries[op['id']]
+                db.session.delete(entry)
+                applied.append((index, 'deleted', entry))
+
+        # Everything goes out in a single transaction (one commit, one fsync)
+        try:
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            return {'message': 'Bulk operation failed, nothing was applied'}, 500
+
+        output = [bulk_result(i, 'error', message=err) for i, err in enumerate(results) if err]
+        output += [bulk_result(i, status, id=entry.id) for i, status, entry in applied]
+        output.sort(key=lambda result: result['index'])
+        return {'results': output}, 200
+
+
+CHANGES_PRUNED = 'Changes since then are no longer kept; export the entries and start again without since'
+
+
+class EntryChangesResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self):
+        args = changes_parser.parse_args()
+        limit = max(1, min(args['limit'], MAX_PAGE_SIZE))
+        fields = parse_fields(args['fields'])
+        if fields is None:
+            return {'message': 'Unknown field requested'}, 400
+        since = change_cursor(args['since'])
+        if since is None:
+            return {'message': CHANGES_PRUNED}, 410
+
+        changes = fetch_changes(since, fields, limit + 1)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        return {
+            'changes': changes,
+            'next_since': changes[-1]['seq'] if changes else since,
+            'has_more': has_more
+        }
+
+
+class EntryChangeStreamResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self):
+        args = changes_parser.parse_args()
+        fields = parse_fields(args['fields'])
+        if fields is None:
+            return {'message': 'Unknown field requested'}, 400
+        # An EventSource that reconnects says where it got to
+        since = request.headers.get('Last-Event-ID', args['since'], type=int)
+        since = change_cursor(since)
+        if since is None:
+            return {'message': CHANGES_PRUNED}, 410
+        # Ends when the token expires at the latest, so the client has to
+        # come back with a valid one
+        max_age = min(current_app.config['CHANGE_STREAM_MAX_AGE'], get_jwt()['exp'] - time.time())
+        response = change_stream_response(since, fields, max_age, MAX_PAGE_SIZE)
+        if response is None:
+            return {'message': 'Too many change streams open, please try again shortly.'}, 503, {'Retry-After': '1'}
+        return response
+
+
+class EntryExportResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self):
+        fields = parse_fields(request.args.get('fields'))
+        if fields is None:
+            return {'message': 'Unknown field requested'}, 400
+        return export_response(fields)
+
+
+class EntrySearchResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self):
+        args = search_parser.parse_args()
+        if not args['q'].strip():
+            return {'message': 'Search query must not be empty'}, 400
+        limit = max(1, min(args['limit'], MAX_PAGE_SIZE))
+        offset = max(0, args['offset'])
+
+        rows, has_more = search_entries(args['q'], limit, offset)
         return {
-            'id': entry.id,
-            'title': entry.title,
-            'category': entry.category,
-            'content': entry.content
+            'entries': [dict(row._mapping) for row in rows],
+            'next_offset': offset + limit if has_more else None
         }
 
+
+class CacheStatsResource(Resource):
+    @jwt_required()
+    def get(self):
+        return cache.stats()
+
+
+class CategoryListResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self):
+        cache_key = f"entry:categories:{cache.generation('entry')}"
+        categories = cache.get(cache_key)
+        if categories is None:
+            # Counts are kept up to date on every write, so this never scans entry
+            rows = CategoryCount.query.order_by(CategoryCount.category).all()
+            categories = [{'category': row.category, 'count': row.count} for row in rows]
+            cache.set(cache_key, categories)
+        return {'categories': categories}
+
+
+class BatchResource(Resource):
+    @jwt_required()
+    def post(self):
+        payload = request.get_json(silent=True) or {}
+        if not isinstance(payload, dict):
+            return {'message': 'Request body must be a JSON object'}, 400
+        specs = payload.get('requests')
+        if not isinstance(specs, list) or not specs:
+            return {'message': 'requests must be a non-empty list'}, 400
+        max_requests = current_app.config['BATCH_MAX_REQUESTS']
+        if len(specs) > max_requests:
+            return {'message': f'At most {max_requests} requests per batch'}, 400
+        # Admission took one token for the batch; it costs one per request
+        rejected = charge(len(specs) - 1)
+        if rejected is not None:
+            return rejected
+        return {'responses': run_batch(specs, parallel=bool(payload.get('parallel')))}
+
+
+class EntryResource(Resource):
+    @jwt_required()
+    @read_only
+    def get(self, entry_id):
+        # Per-entry generation, read before the query: a copy read just before a
+        # write to this entry commits is stored under a key that's never read again
+        cache_key = f"entry:item:{entry_id}:{cache.generation(f'entry:{entry_id}')}"
+        data = cache.get(cache_key)
+        if data is None:
+            if request.if_none_match:
+                # Check the version first so a matching ETag never loads the content
+                version = db.session.execute(
+                    ENTRY_SCHEMA.select(('version',)).where(entry_table.c.id == entry_id)
+                ).scalar()
+                if version is None:
+                    abort(404)
+                cached = not_modified(f'{entry_id}-{version}')
+                if cached is not None:
+                    return cached
+
+            row = db.session.execute(
+                ENTRY_SCHEMA.select(('version',) + ENTRY_FIELDS).where(entry_table.c.id == entry_id)
+            ).first()
+            if row is None:
+                abort(404)
+            data = {'version': row[0], 'entry': dict(zip(ENTRY_FIELDS, row[1:]))}
+            cache.set(cache_key, data)
+
+        etag = f"{entry_id}-{data['version']}"
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        return data['entry'], 200, {'ETag': quote_etag(etag)}
+
     @jwt_required()
     def put(self, entry_id):
         data = entry_parser.parse_args()
         entry = Entry.query.get_or_404(entry_id)
-        entry.title = data['title']
-        entry.category = data['category']
-        entry.content = data['content']
-        db.session.commit()
+        if not can_modify(entry.user_id):
+            return {'message': "You don't have permission to modify this entry"}, 403
+        fields = {name: data[name] for name in ('title', 'category', 'content')}
+        if not write(update_entry, entry_id, fields):
+            abort(404)
         return {'message': 'Entry updated'}
 
     @jwt_required()
     def delete(self, entry_id):
         entry = Entry.query.get_or_404(entry_id)
-        db.session.delete(entry)
-        db.session.commit()
+        if not can_modify(entry.user_id):
+            return {'message': "You don't have permission to modify this entry"}, 403
+        if not write(remove_entry, entry_id):
+            abort(404)
         return {'message': 'Entry deleted'}
 
 
-# Register API routes
-api.add_resource(ApiLoginResource, '/api/login')
-api.add_resource(EntryListResource, '/api/entries')
-api.add_resource(EntryResource, '/api/entries/<int:entry_id>')
-
+def register_resources(api):
+    api.representation('application/json')(output_json)
+    api.add_resource(ApiLoginResource, '/api/login')
+    api.add_resource(TokenRefreshResource, '/api/token/refresh')
+    api.add_resource(TokenRevokeResource, '/api/token/revoke')
+    api.add_resource(EntryListResource, '/api/entries')
+    api.add_resource(EntryBulkResource, '/api/entries/bulk')
+    api.add_resource(EntryExportResource, '/api/entries/export')
+    api.add_resource(EntryChangesResource, '/api/entries/changes')
+    api.add_resource(EntryChangeStreamResource, '/api/entries/changes/stream')
+    api.add_resource(EntrySearchResource, '/api/entries/search')
+    api.add_resource(CategoryListResource, '/api/categories')
+    api.add_resource(CacheStatsResource, '/api/cache/stats')
+    api.add_resource(EntryResource, '/api/entries/<int:entry_id>')
+    api.add_resource(BatchResource, '/api/batch')
 
 # ----------------------------
 # Web Routes
 # ----------------------------
 
-@app.route('/')
+INDEX_PAGE_SIZE = 20
+INDEX_FIELDS = ('id', 'version', 'title', 'category', 'snippet')
+
+
+@read_only
 def index():
-    entries = Entry.query.order_by(Entry.id.desc()).all()
-    return render_template('index.html', entries=entries)
+    before = request.args.get('before', type=int)
+    cache_key = f"entry:index:{cache.generation('entry')}:{before}"
+    page = cache.get(cache_key)
+    if page is None:
+        # Newest first, one page at a time, without touching Entry.content
+        query = ENTRY_SCHEMA.select(INDEX_FIELDS)
+        if before is not None:
+            query = query.where(entry_table.c.id < before)
+        rows = db.session.execute(
+            query.order_by(entry_table.c.id.desc()).limit(INDEX_PAGE_SIZE + 1)
+        ).all()
+        page = {
+            'entries': ENTRY_SCHEMA.dicts(INDEX_FIELDS, rows[:INDEX_PAGE_SIZE]),
+            'next_before': rows[INDEX_PAGE_SIZE - 1][0] if len(rows) > INDEX_PAGE_SIZE else None
+        }
+        cache.set(cache_key, page)
+
+    fragments = [render_entry_fragment(entry) for entry in page['entries']]
+    return render_template('index.html', fragments=fragments,
+                           next_before=page['next_before'], is_first_page=before is None)
+
+
+def render_entry_fragment(entry):
+    """Render one homepage list item, cached until the entry's version changes."""
+    key = f"entry:{entry['id']}:html:{entry['version']}"
+    html = cache.get(key)
+    if html is None:
+        html = render_template('_entry.html', entry=entry)
+        cache.set(key, html)
+    return html
 
 
-@app.route('/add', methods=['GET', 'POST'])
 @login_required
 def add_entry():
     if request.method == 'POST':
@@ -168,63 +713,59 @@ def add_entry():
         entry_category = request.form['category']
         entry_content = request.form['content']
 
-        new_entry = Entry(
-            title=entry_title,
-            category=entry_category,
-            content=entry_content,
-            user_id=current_user.id
-        )
-        db.session.add(new_entry)
-        db.session.commit()
+        write(insert_entry, {
+            'title': entry_title,
+            'category': entry_category,
+            'content': entry_content,
+            'user_id': current_user.id,
+        })
         flash("Entry added successfully!", "success")
         return redirect(url_for('index'))
 
     return render_template('add_entry.html')
 
 
-@app.route('/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_entry(id):
-    entry = Entry.query.get_or_404(id)
+    # The form shows the content, so load it with the row rather than lazily
+    entry = Entry.query.options(undefer(Entry.content)).get_or_404(id)
 
-    if entry.author != current_user and not current_user.is_admin:
+    if entry.user_id != current_user.id and not current_user.is_admin:
         flash("You don't have permission to edit this entry.", "danger")
         return redirect(url_for('index'))
 
     if request.method == 'POST':
-        entry.title = request.form['title']
-        entry.category = request.form['category']
-        entry.content = request.form['content']
-        db.session.commit()
+        fields = {name: request.form[name] for name in ('title', 'category', 'content')}
+        if not write(update_entry, id, fields):
+            abort(404)
         flash("Entry updated successfully!", "success")
         return redirect(url_for('index'))
 
     return render_template('edit_entry.html', entry=entry)
 
 
-@app.route('/delete/<int:id>')
 @login_required
 def delete_entry(id):
     entry = Entry.query.get_or_404(id)
 
-    if entry.author != current_user and not current_user.is_admin:
+    if entry.user_id != current_user.id and not current_user.is_admin:
         flash("You don't have permission to delete this entry.", "danger")
         return redirect(url_for('index'))
 
-    db.session.delete(entry)
-    db.session.commit()
+    if not write(remove_entry, id):
+        abort(404)
     flash("Entry deleted successfully!", "success")
     return redirect(url_for('index'))
 
 
-@app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         user = User.query.filter_by(username=username).first()
 
-        if user and user.check_password(password):
+        if user and hasher.verify_user(user, password):
+            db.session.commit()  # Persists a rehashed password, if any
             login_user(user)
             flash("Logged in successfully!", "success")
             return redirect(url_for('index'))
@@ -234,7 +775,6 @@ def login():
     return render_template('login.html')
 
 
-@app.route('/logout')
 @login_required
 def logout():
     logout_user()
@@ -242,7 +782,6 @@ def logout():
     return redirect(url_for('index'))
 
 
-@app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -254,7 +793,7 @@ def register():
             return redirect(url_for('register'))
 
         new_user = User(username=username)
-        new_user.set_password(password)
+        new_user.password_hash = hasher.hash(password)
         db.session.add(new_user)
         db.session.commit()
         flash("Registration successful! Please log in.", "success")
@@ -263,12 +802,37 @@ def register():
     return render_template('register.html')
 
 
+def healthz():
+    """Readiness probe. Doesn't touch the database, so it answers as soon as a worker is up."""
+    return 'ok'
+
+
+def register_routes(app):
+    app.add_url_rule('/', 'index', index)
+    app.add_url_rule('/add', 'add_entry', add_entry, methods=['GET', 'POST'])
+    app.add_url_rule('/edit/<int:id>', 'edit_entry', edit_entry, methods=['GET', 'POST'])
+    app.add_url_rule('/delete/<int:id>', 'delete_entry', delete_entry)
+    app.add_url_rule('/login', 'login', login, methods=['GET', 'POST'])
+    app.add_url_rule('/logout', 'logout', logout)
+    app.add_url_rule('/register', 'register', register, methods=['GET', 'POST'])
+    app.add_url_rule('/healthz', 'healthz', healthz)
+
+
 # ----------------------------
-# Create DB & Run App
+# Database Setup
 # ----------------------------
 
-with app.app_context():
-    db.create_all()
+def init_db():
+    """Create tables, apply migrations, build the search index and seed the admin user.
+
+    Safe to run again. Needs an app context; ``create_app`` never calls it, so
+    importing the app or starting a worker doesn't touch the database.
+    """
+    # The read bind points at the same database, so only create tables once
+    db.create_all(bind_key=None)
+    for description in migrate():
+        print(f"Applied migration {description}")
+    init_search_index()
 
     # Optional: Seed admin user
     if not User.query.filter_by(username='admin').first():
@@ -281,5 +845,53 @@ with app.app_context():
     else:
         print("Admin user already exists.")
 
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create or upgrade the database (flask --app app init-db)."""
+    init_db()
+
+
+# ----------------------------
+# App Factory & Run App
+# ----------------------------
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.from_object(load_config(config))
+    init_engine_config(app.config)
+
+    db.init_app(app)
+    jwt.init_app(app)
+    login_manager.init_app(app)
+    app.extensions['cache'] = make_cache(app.config)
+    app.extensions['password_hasher'] = PasswordHasher.from_config(app.config)
+    app.extensions['token_blocklist'] = Blocklist.from_config(app.config)
+
+    api = Api(app)
+    register_resources(api)
+    register_routes(app)
+    app.context_processor(inject_year)
+    app.cli.add_command(init_db_command)
+    init_metrics(app)
+    init_admission(app)
+    init_compression(app)
+    init_assets(app)
+    init_writes(app)
+    init_changes(app)
+    init_batch(app)
+
+    # Only registers connect hooks; no connection is opened until a request needs one
+    with app.app_context():
+        configure_engines(db, app.config)
+
+    return app
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app = create_app()
+    # Development convenience: `flask --app app init-db` does this for deployments
+    with app.app_context():
+        init_db()
+    app.run()
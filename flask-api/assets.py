@@ -0,0 +1,117 @@
+"""Fingerprinted, precompressed static files.
+
+``flask build-assets`` copies every file under ``static/`` to
+``static/build/`` with a hash of its content in the name
+(``css/style.3f2a1c9e04.css``), writes ``.gz`` (and, with brotli installed,
+``.br``) versions of text files next to it and records the mapping in
+``static/build/manifest.json``.
+
+Once the manifest exists, ``url_for('static', filename='css/style.css')``
+points at the fingerprinted copy, which is served precompressed and cached
+for a year as ``immutable``: a changed file gets a new name, so browsers
+never need to revalidate. Without a build, static files are served as usual.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+import click
+from flask import current_app, send_from_directory
+from flask.cli import with_appcontext
+
+from compression import brotli, choose_encoding
+
+BUILD_DIR = 'build'
+MANIFEST = 'manifest.json'
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def build_assets(static_folder):
+    """Fingerprint and precompress everything in ``static_folder``. Returns the manifest."""
+    build = os.path.join(static_folder, BUILD_DIR)
+    shutil.rmtree(build, ignore_errors=True)
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        if dirpath == static_folder and BUILD_DIR in dirnames:
+            dirnames.remove(BUILD_DIR)
+        for filename in filenames:
+            source = os.path.join(dirpath, filename)
+            name = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            stem, ext = os.path.splitext(name)
+            built = f'{BUILD_DIR}/{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+            target = os.path.join(static_folder, built)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+            if ext in PRECOMPRESS_EXTENSIONS:
+                with open(target + '.gz', 'wb') as f:
+                    f.write(gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    with open(target + '.br', 'wb') as f:
+                        f.write(brotli.compress(data, quality=11))
+            manifest[name] = built
+
+    with open(os.path.join(build, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Fingerprint and precompress static files into static/build/."""
+    manifest = build_assets(current_app.static_folder)
+    for name, built in sorted(manifest.items()):
+        print(f"{name} -> {built}")
+
+
+def fingerprint_static_url(endpoint, values):
+    """``url_defaults`` hook: swap a static filename for its fingerprinted copy."""
+    if endpoint == 'static':
+        manifest = current_app.extensions['static_assets']['manifest']
+        filename = values.get('filename')
+        if filename in manifest:
+            values['filename'] = manifest[filename]
+
+
+def serve_static(filename):
+    """Static view: built files go out precompressed and immutable, others as usual."""
+    encodings = current_app.extensions['static_assets']['built'].get(filename)
+    if encodings is None:
+        return current_app.send_static_file(filename)
+
+    encoding = choose_encoding(encodings)
+    suffix = dict(PRECOMPRESSED).get(encoding, '')
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_from_directory(current_app.static_folder, filename + suffix, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if encodings:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def init_assets(app):
+    path = os.path.join(app.static_folder, BUILD_DIR, MANIFEST)
+    manifest = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+    # Built file -> precompressed encodings on disk, checked once at startup
+    built = {
+        name: [encoding for encoding, suffix in PRECOMPRESSED
+               if os.path.exists(os.path.join(app.static_folder, name + suffix))]
+        for name in manifest.values()
+    }
+    app.extensions['static_assets'] = {'manifest': manifest, 'built': built}
+    app.url_defaults(fingerprint_static_url)
+    app.view_functions['static'] = serve_static
+    app.cli.add_command(build_assets_command)
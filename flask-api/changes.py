@@ -0,0 +1,232 @@
+"""Entry change log, delta sync and the change stream.
+
+Every insert, update and delete of an entry also writes a row to
+``entry_change``, in the same transaction, numbered by an increasing
+``seq``. SQLite commits one writer at a time, so changes become visible in
+``seq`` order and a client that has seen everything up to ``seq`` N only
+needs the rows after N:
+
+- ``GET /api/entries/changes?since=N`` pages through them;
+- ``GET /api/entries/changes/stream`` sends them as Server-Sent Events and
+  keeps the connection open for new ones.
+
+Each change carries the entry as it is now (or ``null`` once deleted), so a
+client applies changes by upserting or deleting by id. Rows older than
+``CHANGE_LOG_RETENTION_DAYS`` are pruned; a client further behind than that
+gets ``410 Gone`` and has to export the entries again.
+
+A stream waits on its process's ``ChangeFeed``, which is woken by commits
+in the same process and polls the table every ``CHANGE_FEED_POLL_INTERVAL``
+seconds for changes made by other workers.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Response, current_app, has_app_context
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, object_session
+
+from models import db, Entry, EntryChange
+from serializers import ENTRY_SCHEMA, dumps, entry_table
+
+change_table = EntryChange.__table__
+
+EVENT_STREAM_MIMETYPE = 'text/event-stream'
+# How long an EventSource waits before reconnecting after a stream ends
+RECONNECT_DELAY_MS = 1000
+
+
+def _log_change(connection, entry, op):
+    seq = connection.execute(insert(change_table).values(
+        entry_id=entry.id, op=op, version=entry.version, changed_at=datetime.utcnow()
+    )).inserted_primary_key[0]
+    session = object_session(entry)
+    if session is not None:
+        session.info['entry_changed'] = True
+    config = current_app.config if has_app_context() else {}
+    if seq % config.get('CHANGE_LOG_PRUNE_EVERY', 1000) == 0:
+        cutoff = datetime.utcnow() - timedelta(days=config.get('CHANGE_LOG_RETENTION_DAYS', 7))
+        # The newest change is always kept, so the log still knows where it is
+        connection.execute(delete(change_table).where(
+            change_table.c.changed_at < cutoff, change_table.c.seq < seq))
+
+
+@event.listens_for(Entry, 'after_insert')
+def _entry_created(mapper, connection, entry):
+    _log_change(connection, entry, 'create')
+
+
+@event.listens_for(Entry, 'after_update')
+def _entry_updated(mapper, connection, entry):
+    # Also called for entries that were marked dirty but didn't change
+    if object_session(entry).is_modified(entry, include_collections=False):
+        _log_change(connection, entry, 'update')
+
+
+@event.listens_for(Entry, 'after_delete')
+def _entry_deleted(mapper, connection, entry):
+    _log_change(connection, entry, 'delete')
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_streams(session):
+    if session.info.pop('entry_changed', False) and has_app_context():
+        feed = current_app.extensions.get('change_feed')
+        if feed is not None:
+            feed.notify()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard(session, previous_transaction):
+    session.info.pop('entry_changed', None)
+
+
+def change_cursor(since):
+    """Where to start reading: ``since``, or the newest change if it is None.
+
+    Returns None when changes right after ``since`` were already pruned.
+    """
+    oldest, newest = db.session.execute(
+        select(func.min(change_table.c.seq), func.max(change_table.c.seq))
+    ).one()
+    if since is None:
+        return newest or 0
+    if oldest is not None and since < oldest - 1:
+        return None
+    return since
+
+
+def fetch_changes(since, fields, limit):
+    """Up to ``limit`` changes after ``since``, each with the entry's current ``fields``."""
+    from_clause = change_table.outerjoin(entry_table, entry_table.c.id == change_table.c.entry_id)
+    query = (ENTRY_SCHEMA.select(fields, from_clause)
+             .add_columns(change_table.c.seq, change_table.c.op, change_table.c.entry_id,
+                          change_table.c.version)
+             .where(change_table.c.seq > since)
+             .order_by(change_table.c.seq)
+             .limit(limit))
+    changes = []
+    for row in db.session.execute(query):
+        seq, op, entry_id, version = row[-4:]
+        # The id is the first field; it is None once the entry is gone
+        entry = dict(zip(fields, row)) if op != 'delete' and row[0] is not None else None
+        changes.append({'seq': seq, 'op': op, 'id': entry_id, 'version': version, 'entry': entry})
+    return changes
+
+
+class ChangeFeed:
+    """Wakes this process's change streams when the newest ``seq`` moves on."""
+
+    def __init__(self, app, poll_interval=1, max_subscribers=2):
+        self.app = app
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self.newest = 0
+        self.subscribers = 0
+        self._changed = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, app):
+        config = app.config
+        return cls(
+            app,
+            poll_interval=config.get('CHANGE_FEED_POLL_INTERVAL', 1),
+            max_subscribers=config.get('CHANGE_STREAM_MAX_SUBSCRIBERS', 2),
+        )
+
+    def notify(self):
+        """Look for new changes now rather than at the next poll."""
+        self._wake.set()
+
+    def subscribe(self):
+        """Count a new stream. Returns False if there are ``max_subscribers`` already."""
+        with self._changed:
+            if self.subscribers >= self.max_subscribers:
+                return False
+            self.subscribers += 1
+            # Started on first use, like the write queue, so it runs in the
+            # worker process rather than in a Gunicorn master
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+                self._thread.start()
+            self._changed.notify_all()
+        return True
+
+    def unsubscribe(self):
+        with self._changed:
+            self.subscribers -= 1
+
+    def wait(self, since, timeout):
+        """Block until a change after ``since`` is known or ``timeout`` passes. Returns whether one is."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.newest > since, timeout)
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                with self._changed:
+                    # Nobody to wake: stop polling until someone subscribes
+                    self._changed.wait_for(lambda: self.subscribers > 0)
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                try:
+                    with db.engine.connect() as connection:
+                        newest = connection.execute(select(func.max(change_table.c.seq))).scalar() or 0
+                except SQLAlchemyError:
+                    # Streams keep their heartbeats; try again at the next poll
+                    self.app.logger.exception('Polling the entry change log failed')
+                    continue
+                with self._changed:
+                    if newest > self.newest:
+                        self.newest = newest
+                        self._changed.notify_all()
+
+
+def server_sent_event(change):
+    return b'id: %d\nevent: %s\ndata: %s\n\n' % (change['seq'], change['op'].encode(), dumps(change))
+
+
+def stream_changes(feed, since, fields, deadline, page_size):
+    """Yield changes after ``since`` as SSE until ``deadline`` (``time.monotonic()``)."""
+    heartbeat = feed.app.config['CHANGE_STREAM_HEARTBEAT']
+    yield b'retry: %d\n\n' % RECONNECT_DELAY_MS
+    while True:
+        # The request context (and its admission slot) ends once the
+        # response starts, so each read gets an app context of its own. Its
+        # session goes when it ends, so no connection is held while waiting.
+        with feed.app.app_context():
+            db.session.info['read_only'] = True
+            changes = fetch_changes(since, fields, page_size)
+        for change in changes:
+            yield server_sent_event(change)
+            since = change['seq']
+        if len(changes) == page_size:
+            continue
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if not feed.wait(since, min(heartbeat, remaining)):
+            yield b': keep-alive\n\n'
+
+
+def change_stream_response(since, fields, max_age, page_size):
+    """The SSE response, or None if this process already serves as many streams as it may."""
+    feed = current_app.extensions['change_feed']
+    if not feed.subscribe():
+        return None
+    deadline = time.monotonic() + max_age
+    response = Response(stream_changes(feed, since, fields, deadline, page_size),
+                        mimetype=EVENT_STREAM_MIMETYPE,
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs when the server is done with the response, even if the client
+    # went away before the first event
+    response.call_on_close(feed.unsubscribe)
+    return response
+
+
+def init_changes(app):
+    app.extensions['change_feed'] = ChangeFeed.from_config(app)
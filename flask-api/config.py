@@ -0,0 +1,164 @@
+import os
+from datetime import timedelta
+
+
+class Config:
+    """Settings for local development with ``python app.py``."""
+    DEBUG = True
+    # Let flask_jwt_extended's errors reach its 401/422 handlers; otherwise
+    # flask-restful answers them with a 500 whenever DEBUG is off
+    PROPAGATE_EXCEPTIONS = True
+    SECRET_KEY = 'your-secret-key-here'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///knowledge_base.db'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool of the primary and read engines
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_TIMEOUT = 30  # seconds
+    # Read-only views (lists, single entries, search, homepage) query this
+    # database; by default it's the primary one opened read-only.
+    SQLALCHEMY_READ_DATABASE_URI = None
+    # Applied to every new SQLite connection
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # readers don't block the writer
+        'synchronous': 'NORMAL',  # safe with WAL, far fewer fsyncs
+        'busy_timeout': 5000,  # ms to wait for a lock before "database is locked"
+        'cache_size': -20000,  # negative means KiB, so 20 MB of page cache
+        'mmap_size': 268435456,  # 256 MB
+        'temp_store': 'MEMORY',
+    }
+
+    CACHE_TYPE = 'lru'  # 'lru', 'redis' or 'null'
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_TTL = 60  # seconds
+    CACHE_REDIS_URL = 'redis://localhost:6379/0'
+
+    PASSWORD_HASH_METHOD = 'scrypt'  # any werkzeug method, e.g. 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_QUEUE_SIZE = 16  # hashes allowed to wait before we answer 503
+    PASSWORD_HASH_TIMEOUT = 10  # seconds
+    PASSWORD_HASH_EXECUTOR = 'thread'  # or 'process'
+
+    # Request/SQL metrics at /metrics; requests running more SQL statements
+    # than the threshold are counted and logged
+    METRICS_ENABLED = True
+    METRICS_QUERY_THRESHOLD = 20
+
+    # gzip/brotli for dynamic responses of these types, from this many bytes up
+    COMPRESS_MIMETYPES = {
+        'application/json', 'text/html', 'text/css', 'text/javascript',
+        'application/javascript', 'text/plain',
+    }
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6  # gzip, 1-9
+    COMPRESS_BROTLI_QUALITY = 4  # 0-11; higher is far slower per request
+
+    # Admission control for API resources and web pages (see admission.py).
+    # Read from the environment here too so benchmarks can switch it off.
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+    ADMISSION_RATE = 20  # requests per second per identity; 0 turns the token buckets off
+    ADMISSION_BURST = 40
+    ADMISSION_MAX_IDENTITIES = 10000  # buckets kept per process
+    # Requests in flight per process: starts at the initial limit and moves
+    # between min and max depending on whether requests finish within the target
+    ADMISSION_INITIAL_LIMIT = 16
+    ADMISSION_MIN_LIMIT = 1
+    ADMISSION_MAX_LIMIT = 64
+    ADMISSION_LATENCY_TARGET = 0.5  # seconds; a login alone spends ~0.1-0.2 s hashing
+
+    # Coalesce entry writes into group commits made by one writer thread per
+    # process (see writes.py). A batch takes the writes already queued, up to
+    # this many; with a max wait it also lingers that long for more.
+    WRITE_BATCHING = False
+    WRITE_BATCH_MAX_SIZE = 64
+    WRITE_BATCH_MAX_WAIT = 0  # seconds
+    WRITE_QUEUE_SIZE = 1024  # writes allowed to wait before we answer 503
+    WRITE_TIMEOUT = 10  # seconds
+
+    # Entry change feed (see changes.py): /api/entries/changes and its stream
+    CHANGE_LOG_RETENTION_DAYS = 7  # older changes are pruned; clients behind that resync
+    CHANGE_LOG_PRUNE_EVERY = 1000  # changes logged between prunes
+    CHANGE_FEED_POLL_INTERVAL = 1  # seconds; how soon other processes' changes are streamed
+    CHANGE_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+    CHANGE_STREAM_MAX_AGE = 300  # seconds; clients reconnect with Last-Event-ID
+    CHANGE_STREAM_MAX_SUBSCRIBERS = 2  # per process; each stream holds a server thread
+
+    # POST /api/batch (see batch.py). A batch is rate limited as that many
+    # requests, so keep the cap at or below ADMISSION_BURST.
+    BATCH_MAX_REQUESTS = 20
+    BATCH_MAX_WORKERS = 4  # per process; threads for the GETs of parallel batches
+
+    JWT_SECRET_KEY = 'your-jwt-secret-key-here'
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=5)  # 👈 Set expiry here
+    # Trade at /api/token/refresh for a new pair instead of logging in again
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    # Revoked token ids are looked up in a per-process Bloom filter sized for
+    # this many tokens, re-synced from the database every few seconds
+    TOKEN_BLOCKLIST_CAPACITY = 100000
+    TOKEN_BLOCKLIST_ERROR_RATE = 0.01
+    TOKEN_BLOCKLIST_SYNC_INTERVAL = 5  # seconds
+
+
+class ProductionConfig(Config):
+    """Preset for the container image: everything can be overridden from the environment."""
+    DEBUG = False
+    SECRET_KEY = os.environ.get('SECRET_KEY', Config.SECRET_KEY)
+    SQLALCHEMY_DATABASE_URI = os.environ.get('SQLALCHEMY_DATABASE_URI', Config.SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_READ_DATABASE_URI = os.environ.get('SQLALCHEMY_READ_DATABASE_URI')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', Config.DB_POOL_SIZE))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', Config.DB_MAX_OVERFLOW))
+
+    # Every worker process has its own LRU, so only cache when the cache is shared
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', Config.CACHE_REDIS_URL)
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'redis' if 'CACHE_REDIS_URL' in os.environ else 'null')
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', Config.CACHE_TTL))
+
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', Config.PASSWORD_HASH_METHOD)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', Config.PASSWORD_HASH_WORKERS))
+
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_QUERY_THRESHOLD = int(os.environ.get('METRICS_QUERY_THRESHOLD', Config.METRICS_QUERY_THRESHOLD))
+
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', Config.COMPRESS_MIN_SIZE))
+
+    ADMISSION_RATE = float(os.environ.get('ADMISSION_RATE', Config.ADMISSION_RATE))
+    ADMISSION_BURST = int(os.environ.get('ADMISSION_BURST', Config.ADMISSION_BURST))
+    ADMISSION_MAX_LIMIT = int(os.environ.get('ADMISSION_MAX_LIMIT', Config.ADMISSION_MAX_LIMIT))
+    ADMISSION_LATENCY_TARGET = float(os.environ.get('ADMISSION_LATENCY_TARGET', Config.ADMISSION_LATENCY_TARGET))
+
+    WRITE_BATCHING = os.environ.get('WRITE_BATCHING', '0') == '1'
+    WRITE_BATCH_MAX_SIZE = int(os.environ.get('WRITE_BATCH_MAX_SIZE', Config.WRITE_BATCH_MAX_SIZE))
+    WRITE_BATCH_MAX_WAIT = float(os.environ.get('WRITE_BATCH_MAX_WAIT', Config.WRITE_BATCH_MAX_WAIT))
+
+    CHANGE_LOG_RETENTION_DAYS = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', Config.CHANGE_LOG_RETENTION_DAYS))
+    CHANGE_FEED_POLL_INTERVAL = float(os.environ.get('CHANGE_FEED_POLL_INTERVAL', Config.CHANGE_FEED_POLL_INTERVAL))
+    CHANGE_STREAM_MAX_SUBSCRIBERS = int(os.environ.get('CHANGE_STREAM_MAX_SUBSCRIBERS', Config.CHANGE_STREAM_MAX_SUBSCRIBERS))
+
+    BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', Config.BATCH_MAX_REQUESTS))
+    BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', Config.BATCH_MAX_WORKERS))
+
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', Config.JWT_SECRET_KEY)
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.environ.get('JWT_REFRESH_TOKEN_DAYS', 30)))
+
+
+configs = {
+    'development': Config,
+    'production': ProductionConfig,
+}
+
+
+def load_config(config=None):
+    """Resolve ``create_app``'s argument to a config object.
+
+    Accepts a preset name, a config class or a dict of overrides on top of
+    the development defaults. When nothing is given the ``APP_CONFIG``
+    environment variable picks the preset.
+    """
+    if config is None:
+        config = os.environ.get('APP_CONFIG', 'development')
+    if isinstance(config, str):
+        return configs[config]
+    if isinstance(config, dict):
+        return type('CustomConfig', (Config,), config)
+    return config
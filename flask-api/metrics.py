@@ -0,0 +1,93 @@
+"""Request and database metrics, served in Prometheus text format at ``/metrics``.
+
+Every request records its duration and status per route, plus how many SQL
+statements it ran and how long they took. Requests that run more than
+``METRICS_QUERY_THRESHOLD`` statements are counted and logged.
+
+Under Gunicorn each worker is its own process; ``gunicorn.conf.py`` points
+``PROMETHEUS_MULTIPROC_DIR`` at a shared directory so that ``/metrics`` on
+any worker reports the totals for the whole replica.
+"""
+import os
+import time
+
+from flask import Response, current_app, g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+    generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LABELS = ('method', 'route')
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request', LABELS
+)
+REQUESTS = Counter(
+    'http_requests_total', 'Requests handled', LABELS + ('status',)
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL statements run per request', LABELS,
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, float('inf'))
+)
+QUERY_DURATION = Counter(
+    'db_query_duration_seconds_total', 'Time spent running SQL statements', LABELS
+)
+QUERY_HEAVY_REQUESTS = Counter(
+    'http_requests_over_query_threshold_total',
+    'Requests that ran more SQL statements than METRICS_QUERY_THRESHOLD', LABELS
+)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    # Queries outside a request (init-db, the async API) aren't attributed
+    if has_request_context() and 'query_count' in g:
+        g.query_count += 1
+        g.query_time += elapsed
+
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+    g.query_count = 0
+    g.query_time = 0.0
+
+
+def _record(response):
+    if 'request_started' not in g:
+        return response
+    labels = (request.method, request.url_rule.rule if request.url_rule else '<unmatched>')
+    REQUEST_DURATION.labels(*labels).observe(time.perf_counter() - g.request_started)
+    REQUESTS.labels(*labels, str(response.status_code)).inc()
+    REQUEST_QUERIES.labels(*labels).observe(g.query_count)
+    QUERY_DURATION.labels(*labels).inc(g.query_time)
+    if g.query_count > current_app.config['METRICS_QUERY_THRESHOLD']:
+        QUERY_HEAVY_REQUESTS.labels(*labels).inc()
+        current_app.logger.warning('%s %s ran %d SQL statements (%.1f ms)', request.method,
+                                   request.path, g.query_count, g.query_time * 1000)
+    return response
+
+
+def metrics():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """Time every request of ``app`` and serve ``/metrics``."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.before_request(_start_timer)
+    app.after_request(_record)
+    app.add_url_rule('/metrics', 'metrics', metrics)
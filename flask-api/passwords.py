@@ -0,0 +1,86 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(ServiceUnavailable):
+    description = 'Too many logins in progress, please try again shortly.'
+
+
+class PasswordHasher:
+    """Runs password hashing and checks on a small, bounded worker pool.
+
+    At most ``workers + queue_size`` hashes can be running or waiting at once;
+    anything beyond that is rejected straight away with a 503 instead of
+    tying up the request worker.
+    """
+
+    def __init__(self, method='scrypt', workers=2, queue_size=16, timeout=10, executor='thread'):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self.executor = executor
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._method_id = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            method=config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+            workers=config.get('PASSWORD_HASH_WORKERS', 2),
+            queue_size=config.get('PASSWORD_HASH_QUEUE_SIZE', 16),
+            timeout=config.get('PASSWORD_HASH_TIMEOUT', 10),
+            executor=config.get('PASSWORD_HASH_EXECUTOR', 'thread'),
+        )
+
+    @property
+    def pool(self):
+        # Created on first use so importing the app doesn't start workers
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    pool_cls = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+                    self._pool = pool_cls(max_workers=self.workers)
+        return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy(retry_after=1)
+        try:
+            future = self.pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHasherBusy(retry_after=1)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if ``password_hash`` was made with other parameters than ``method``."""
+        if self._method_id is None:
+            # werkzeug expands e.g. 'scrypt' to 'scrypt:32768:8:1' in the hash prefix
+            self._method_id = self.hash('').split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._method_id
+
+    def verify_user(self, user, password):
+        """Check ``user``'s password, upgrading the stored hash if parameters changed.
+
+        The caller is responsible for committing the session.
+        """
+        if not user.password_hash or not self.verify(user.password_hash, password):
+            return False
+        if self.needs_rehash(user.password_hash):
+            user.password_hash = self.hash(password)
+        return True
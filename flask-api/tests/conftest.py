@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# The app is a set of top-level modules in flask-api/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_db  # noqa: E402
+from models import db, Entry  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        # Every request goes to the database, and nothing is shed
+        'CACHE_TYPE': 'null',
+        'ADMISSION_ENABLED': False,
+        'TOKEN_BLOCKLIST_SYNC_INTERVAL': 3600,
+    })
+    with app.app_context():
+        init_db()
+        db.session.add_all(Entry(title=f'Entry {i}', category=f'Category {i % 3}',
+                                 content=f'Content {i}', user_id=1) for i in range(40))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    token = client.post('/api/login', json={'username': 'admin', 'password': 'admin123'}).json['access_token']
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    # The first authenticated request loads the token blocklist
+    client.get('/api/categories')
+    return client
+
+
+@pytest.fixture
+def statements():
+    """SQL statements run (on any engine) while the test runs."""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(Engine, 'before_cursor_execute', record)
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+
+
+@pytest.fixture
+def production_app(tmp_path):
+    # DEBUG and TESTING both make Flask propagate exceptions on its own
+    return create_app({
+        'DEBUG': False,
+        'TESTING': False,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'ADMISSION_ENABLED': False,
+    })
+
+
+@pytest.mark.parametrize('method, path', [('get', '/api/entries'), ('post', '/api/token/refresh')])
+def test_missing_token_is_401(production_app, method, path):
+    response = getattr(production_app.test_client(), method)(path)
+    assert response.status_code == 401
+
+
+def test_expired_token_is_401(production_app):
+    with production_app.app_context():
+        token = create_access_token('admin', expires_delta=timedelta(seconds=-1))
+    response = production_app.test_client().get('/api/entries', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 401
+    assert response.json['msg'] == 'Token has expired'
@@ -0,0 +1,49 @@
+"""Entry reads run a fixed number of queries, whatever the page size."""
+import json
+
+import pytest
+
+
+def count_queries(client, statements, url, **kwargs):
+    statements.clear()
+    response = client.get(url, **kwargs)
+    assert response.status_code == 200
+    return len(statements), response
+
+
+@pytest.mark.parametrize('fields', [None, 'title,category', 'title,author'])
+def test_list_query_count_does_not_depend_on_page_size(client, statements, fields):
+    suffix = f'&fields={fields}' if fields else ''
+    small, response = count_queries(client, statements, f'/api/entries?limit=2{suffix}')
+    assert len(response.json['entries']) == 2
+    large, response = count_queries(client, statements, f'/api/entries?limit=30{suffix}')
+    assert len(response.json['entries']) == 30
+    assert small == large == 1
+
+
+def test_author_is_joined_not_loaded_per_entry(client, statements):
+    count, response = count_queries(client, statements, '/api/entries?limit=30&fields=title,author')
+    assert count == 1
+    assert {entry['author'] for entry in response.json['entries']} == {'admin'}
+
+
+def test_single_entry_is_one_query(client, statements):
+    count, response = count_queries(client, statements, '/api/entries/3')
+    assert count == 1
+    assert response.json['id'] == 3
+
+
+def test_revalidation_reads_versions_only(client, statements):
+    _, response = count_queries(client, statements, '/api/entries?limit=30')
+    statements.clear()
+    response = client.get('/api/entries?limit=30', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert len(statements) == 1
+
+
+@pytest.mark.parametrize('fields', ['title', 'title,author'])
+def test_export_is_one_query(client, statements, fields):
+    count, response = count_queries(client, statements, f'/api/entries/export?fields={fields}')
+    lines = [json.loads(line) for line in response.data.splitlines()]
+    assert len(lines) == 40
+    assert count == 1
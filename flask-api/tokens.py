@@ -0,0 +1,138 @@
+"""Refresh-token rotation and the revoked-token blocklist.
+
+``/api/login`` hands out a short-lived access token and a long-lived refresh
+token; ``/api/token/refresh`` trades the refresh token for a new pair, so
+keeping an API session alive costs a signature check rather than a password
+hash. A refresh token works once: rotating it records its ``jti`` in the
+``revoked_token`` table, and the insert fails if another request (in any
+worker) got there first.
+
+Every protected request asks whether its token was revoked. ``Blocklist``
+answers from an in-process Bloom filter of revoked ``jti``s and only queries
+the database when the filter says "maybe". The filter picks up revocations
+made by other processes every ``TOKEN_BLOCKLIST_SYNC_INTERVAL`` seconds, so
+an access token revoked elsewhere can stay usable for that long (it expires
+within minutes anyway); refresh tokens can never be rotated twice.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, RevokedToken
+
+revoked_table = RevokedToken.__table__
+
+
+class BloomFilter:
+    """Set membership with no false negatives and about ``error_rate`` false positives."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def expires_at(claims):
+    return datetime.fromtimestamp(claims['exp'], timezone.utc).replace(tzinfo=None)
+
+
+class Blocklist:
+    """Revoked tokens: the ``revoked_token`` table behind a per-process Bloom filter.
+
+    Needs an app context (it uses ``db.engine``). Rows are deleted once the
+    token would have expired anyway.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.01, sync_interval=5):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._filter = None
+        self._last_id = 0
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            capacity=config.get('TOKEN_BLOCKLIST_CAPACITY', 100000),
+            error_rate=config.get('TOKEN_BLOCKLIST_ERROR_RATE', 0.01),
+            sync_interval=config.get('TOKEN_BLOCKLIST_SYNC_INTERVAL', 5),
+        )
+
+    def _sync(self):
+        """Add rows revoked since the last sync, rebuilding the filter when it is full."""
+        if self._filter is not None and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            if self._filter is not None and time.monotonic() - self._synced_at < self.sync_interval:
+                return
+            with db.engine.connect() as connection:
+                if self._filter is None or self._filter.count >= self._filter.capacity:
+                    # Expired rows no longer matter, so a rebuild starts from the live ones
+                    now = datetime.utcnow()
+                    live = connection.execute(
+                        select(func.count()).where(revoked_table.c.expires_at > now)
+                    ).scalar()
+                    self._filter = BloomFilter(max(self.capacity, 2 * live), self.error_rate)
+                    self._last_id = 0
+                    query = select(revoked_table.c.id, revoked_table.c.jti).where(
+                        revoked_table.c.expires_at > now)
+                else:
+                    query = select(revoked_table.c.id, revoked_table.c.jti).where(
+                        revoked_table.c.id > self._last_id)
+                for row_id, jti in connection.execute(query):
+                    self._filter.add(jti)
+                    self._last_id = max(self._last_id, row_id)
+            self._synced_at = time.monotonic()
+
+    def is_revoked(self, jti):
+        self._sync()
+        if jti not in self._filter:
+            return False
+        # "Maybe": the filter has false positives, the table doesn't
+        with db.engine.connect() as connection:
+            return connection.execute(
+                select(revoked_table.c.id).where(revoked_table.c.jti == jti)
+            ).first() is not None
+
+    def revoke(self, claims):
+        """Revoke the token with these claims. Returns False if it already was."""
+        self._sync()
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(delete(revoked_table).where(
+                    revoked_table.c.expires_at <= datetime.utcnow()))
+                connection.execute(insert(revoked_table).values(
+                    jti=claims['jti'],
+                    token_type=claims['type'],
+                    user_id=claims.get('user_id'),
+                    expires_at=expires_at(claims),
+                ))
+        except IntegrityError:
+            return False
+        with self._lock:
+            self._filter.add(claims['jti'])
+        return True
@@ -0,0 +1,172 @@
+"""Entry writes, optionally coalesced into group commits by one writer thread.
+
+SQLite has a single write lock and every transaction pays for taking it and
+for its commit, so concurrent requests that each commit their own
+transaction end up queueing on the lock. With ``WRITE_BATCHING`` on, ``write()`` instead puts the change
+on a queue. A writer thread takes whatever has queued up, at most
+``WRITE_BATCH_MAX_SIZE`` changes (optionally lingering
+``WRITE_BATCH_MAX_WAIT`` seconds for more), applies them in one transaction
+and commits once. Batches form by themselves: changes that arrive while a
+commit is in progress all go into the next one, so a lone writer isn't
+slowed down. Each caller blocks until its batch is committed and gets its
+own return value or exception back.
+
+If a batch fails to flush or commit, it is rolled back and every change in
+it is retried in a transaction of its own, so one bad write only fails its
+own request.
+
+With batching off (the default) ``write()`` runs the change on the request's
+session and commits it straight away.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from flask import current_app
+from sqlalchemy.orm import undefer
+from werkzeug.exceptions import ServiceUnavailable
+
+from models import db, Entry
+
+
+class WriteQueueBusy(ServiceUnavailable):
+    description = 'Too many writes in progress, please try again shortly.'
+
+
+class WriteQueue:
+    """Applies queued changes in group transactions on a single writer thread."""
+
+    def __init__(self, app, max_batch=64, max_wait=0, queue_size=1024, timeout=10):
+        self.app = app
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._queue = queue.Queue(queue_size)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, app):
+        config = app.config
+        return cls(
+            app,
+            max_batch=config.get('WRITE_BATCH_MAX_SIZE', 64),
+            max_wait=config.get('WRITE_BATCH_MAX_WAIT', 0),
+            queue_size=config.get('WRITE_QUEUE_SIZE', 1024),
+            timeout=config.get('WRITE_TIMEOUT', 10),
+        )
+
+    def submit(self, fn, *args):
+        """Run ``fn(*args)`` in the next group transaction and return its result once committed."""
+        self._start()
+        future = Future()
+        try:
+            self._queue.put_nowait((future, fn, args))
+        except queue.Full:
+            raise WriteQueueBusy(retry_after=1)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Skipped if still queued; a change already being applied may still commit
+            future.cancel()
+            raise WriteQueueBusy(retry_after=1)
+
+    def _start(self):
+        # Started on first use, so it runs in the worker process that serves
+        # requests rather than in a Gunicorn master that forks it away
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='entry-writer', daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = self._next_batch()
+                # Callers that already gave up don't need their change applied
+                batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+                if batch:
+                    self._apply(batch)
+                db.session.remove()
+
+    def _apply(self, batch):
+        results = []
+        try:
+            for future, fn, args in batch:
+                results.append(fn(*args))
+                db.session.flush()
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0][0].set_exception(exc)
+                return
+            # Find the culprit: everyone else gets a transaction of their own
+            for item in batch:
+                self._apply([item])
+            return
+        for (future, fn, args), result in zip(batch, results):
+            future.set_result(result)
+
+
+def write(fn, *args):
+    """Apply an entry change: through the write queue if enabled, else commit it here."""
+    writer = current_app.extensions.get('write_queue')
+    if writer is not None:
+        # End the request's own transaction first, or it keeps a pooled
+        # connection checked out while the writer waits for one
+        db.session.commit()
+        return writer.submit(fn, *args)
+    result = fn(*args)
+    db.session.commit()
+    return result
+
+
+# Changes that can go through write(). They run on whichever session is
+# current (the request's or the writer thread's) and must not commit.
+
+def insert_entry(fields):
+    """Add an entry; returns its id."""
+    entry = Entry(**fields)
+    db.session.add(entry)
+    db.session.flush()
+    return entry.id
+
+
+def update_entry(entry_id, fields):
+    """Change an entry's fields; returns False if it no longer exists."""
+    # With its content, even if the entry is in the session already, so that
+    # setting the same content again isn't counted as a change
+    entry = db.session.get(Entry, entry_id, options=[undefer(Entry.content)], populate_existing=True)
+    if entry is None:
+        return False
+    for name, value in fields.items():
+        setattr(entry, name, value)
+    return True
+
+
+def remove_entry(entry_id):
+    """Delete an entry; returns False if it no longer exists."""
+    entry = db.session.get(Entry, entry_id)
+    if entry is None:
+        return False
+    db.session.delete(entry)
+    return True
+
+
+def init_writes(app):
+    if app.config['WRITE_BATCHING']:
+        app.extensions['write_queue'] = WriteQueue.from_config(app)
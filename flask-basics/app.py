@@ -3,16 +3,26 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from assets import init_assets
+from compression import init_compression
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///knowledge_base.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# gzip/brotli for dynamic responses of these types, from this many bytes up
+app.config['COMPRESS_MIMETYPES'] = {'text/html', 'text/css', 'text/javascript', 'application/json'}
+app.config['COMPRESS_MIN_SIZE'] = 500
+app.config['COMPRESS_LEVEL'] = 6
+app.config['COMPRESS_BROTLI_QUALITY'] = 4
 
 db = SQLAlchemy(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
+init_compression(app)
+# Serves static/build/ after `flask --app app build-assets`
+init_assets(app)
 
 # ----------------------------
 # Models
@@ -84,7 +94,7 @@ def edit_entry(id):
     entry = Entry.query.get_or_404(id)
 
     # Only allow owner or admin to edit
-    if entry.author != current_user and not current_user.is_admin:
+    if entry.user_id != current_user.id and not current_user.is_admin:
         flash("You don't have permission to edit this entry.", "danger")
         return redirect(url_for('index'))
 
@@ -104,7 +114,7 @@ def delete_entry(id):
     entry = Entry.query.get_or_404(id)
 
     # Only allow owner or admin to delete
-    if entry.author != current_user and not current_user.is_admin:
+    if entry.user_id != current_user.id and not current_user.is_admin:
         flash("You don't have permission to delete this entry.", "danger")
         return redirect(url_for('index'))
 
@@ -0,0 +1,60 @@
+"""gzip/brotli compression of dynamic responses.
+
+A response is compressed when the client accepts an encoding we support,
+its mimetype is in ``COMPRESS_MIMETYPES`` and its body is at least
+``COMPRESS_MIN_SIZE`` bytes. Streamed responses and static files, which
+are precompressed at build time (see ``assets.py``), are passed through
+untouched.
+"""
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+# Preferred first
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(available):
+    """The first encoding in ``available`` the client accepts, or None."""
+    for encoding in available:
+        if request.accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress_response(response):
+    config = current_app.config
+    if (response.direct_passthrough or response.is_streamed
+            or not 200 <= response.status_code < 300 or response.status_code == 204
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in config['COMPRESS_MIMETYPES']):
+        return response
+
+    # Caches must keep compressed and uncompressed copies apart
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    encoding = choose_encoding(ENCODINGS)
+    if encoding is None or len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    if encoding == 'br':
+        data = brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    else:
+        data = gzip.compress(data, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    # The bytes differ from the uncompressed representation, so the ETag can
+    # only promise semantic equivalence
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)